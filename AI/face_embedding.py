@@ -1,3 +1,5 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 import torch
 import requests
 import uvicorn
@@ -20,6 +22,9 @@ app.add_middleware(
 
 
 DRF_SEARCH_URL = os.environ.get("DRF_SEARCH_URL", "http://127.0.0.1:8000/api/search/face/")
+# Concurrent requests are collected for up to this long and embedded in one forward pass
+EMBEDDING_BATCH_WAIT_MS = float(os.environ.get("EMBEDDING_BATCH_WAIT_MS", "5"))
+EMBEDDING_MAX_BATCH = int(os.environ.get("EMBEDDING_MAX_BATCH", "32"))
 
 
 try:
@@ -37,29 +42,98 @@ transform = transforms.Compose([
 ])
 
 
-def get_embedding_from_image(image_bytes: bytes) -> list:
+def image_to_tensor(image_bytes: bytes) -> torch.Tensor:
+    try:
+        img = Image.open(io.BytesIO(image_bytes)).convert('RGB')
+        return transform(img)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Could not process image: {e}")
+
+
+def embed_batch(images: torch.Tensor) -> list:
+    with torch.no_grad():
+        return face_model(images).tolist()
+
+
+class EmbeddingBatcher:
+    """
+    Micro-batches concurrent embedding requests.
+
+    Requests wait on a queue; a single collector task takes everything that arrives within
+    `max_wait` of the first request (up to `max_batch` images) and runs one forward pass on
+    a dedicated worker thread, so inference never blocks the event loop. Requests arriving
+    during a forward pass form the next batch.
+    """
+
+    def __init__(self, forward, max_batch=EMBEDDING_MAX_BATCH, max_wait=EMBEDDING_BATCH_WAIT_MS / 1000):
+        self.forward = forward
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._queue = None
+        self._collector = None
+        # One inference thread; torch already parallelizes a batch across cores
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="face-embedding")
+
+    async def embed(self, image: torch.Tensor) -> list:
+        if self._collector is None or self._collector.done():
+            self._queue = asyncio.Queue()
+            self._collector = asyncio.create_task(self._collect())
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((image, future))
+        return await future
+
+    async def _collect(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            if self._queue.qsize() < self.max_batch - 1:
+                await asyncio.sleep(self.max_wait)
+            while len(batch) < self.max_batch and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+
+            # Requests whose client went away are dropped before inference
+            batch = [(image, future) for image, future in batch if not future.done()]
+            if not batch:
+                continue
+            try:
+                embeddings = await loop.run_in_executor(
+                    self._executor, self.forward, torch.stack([image for image, _ in batch])
+                )
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (_, future), embedding in zip(batch, embeddings):
+                if not future.done():
+                    future.set_result(embedding)
+
+
+batcher = EmbeddingBatcher(embed_batch)
+
+
+async def get_embedding_from_image(image_bytes: bytes) -> list:
     if not face_model:
         raise HTTPException(status_code=500, detail="Model is not available.")
 
+    # Decoding and resizing run off the event loop as well
+    img_tensor = await asyncio.to_thread(image_to_tensor, image_bytes)
     try:
-        img = Image.open(io.BytesIO(image_bytes)).convert('RGB')
-        img_tensor = transform(img).unsqueeze(0)
-        with torch.no_grad():
-            embedding = face_model(img_tensor)
-        return embedding.squeeze().tolist()
+        return await batcher.embed(img_tensor)
     except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Could not process image: {e}")
+        raise HTTPException(status_code=500, detail=f"Could not compute embedding: {e}")
 
 @app.post("/identify-and-search/")
 async def identify_and_search(file: UploadFile = File(...)):
     image_bytes = await file.read()
 
-    embedding_list = get_embedding_from_image(image_bytes)
+    embedding_list = await get_embedding_from_image(image_bytes)
 
     payload = {"embedding": embedding_list}
 
     try:
-        response = requests.post(DRF_SEARCH_URL, json=payload, timeout=10)
+        # Blocking HTTP call; in a thread so other requests keep batching meanwhile
+        response = await asyncio.to_thread(requests.post, DRF_SEARCH_URL, json=payload, timeout=10)
         response.raise_for_status()
 
         return response.json()
@@ -110,6 +110,20 @@ TIME_ZONE = 'UTC'
 USE_I18N = True
 USE_TZ = True
 
+# Wall-clock zone of the campus, used for hour-of-day rules such as after-hours access
+CAMPUS_TIME_ZONE = os.getenv('CAMPUS_TIME_ZONE', 'Asia/Kolkata')
+
+# Freezes the alert clock at an ISO timestamp (e.g. 2025-09-25T23:59:59) for historical datasets
+ALERT_CLOCK_NOW = os.getenv('ALERT_CLOCK_NOW')
+
+# Cosine distance under which a face search result counts as a match
+FACE_MATCH_THRESHOLD = float(os.getenv('FACE_MATCH_THRESHOLD', '0.4'))
+
+# In-process face index (api/face_index.py); FACE_INDEX_PATH points at files from build_face_index
+FACE_INDEX_ENABLED = os.getenv('FACE_INDEX_ENABLED', 'False') == 'True'
+FACE_INDEX_PATH = os.getenv('FACE_INDEX_PATH')
+FACE_INDEX_REFRESH_SECONDS = float(os.getenv('FACE_INDEX_REFRESH_SECONDS', '30'))
+
 STATIC_URL = '/static/'
 STATIC_ROOT = BASE_DIR / "staticfiles"
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
\ No newline at end of file
@@ -1,6 +1,8 @@
 import os
 import json
-from typing import List, Dict, Any
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import List, Dict, Any, Optional
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.prompts import PromptTemplate
 from langchain_core.output_parsers import StrOutputParser  # <-- ADD THIS
@@ -8,6 +10,31 @@ from langchain_core.output_parsers import StrOutputParser  # <-- ADD THIS
 
 # LLMChain is deprecated, so we remove its import
 
+# Upper bound for one generate_recommendations call, across all alert types
+RECOMMENDATION_DEADLINE_SECONDS = float(os.environ.get("ALERT_RECOMMENDATION_DEADLINE", "8"))
+
+_recommenders: Dict[str, "GeminiAlertRecommender"] = {}
+_recommenders_lock = threading.Lock()
+_BATCH_WORKERS = 2
+_batch_executor = ThreadPoolExecutor(max_workers=_BATCH_WORKERS, thread_name_prefix="alert-recommender")
+# Free workers; when all are busy with slow batches, requests skip the LLM instead of queueing
+_batch_slots = threading.BoundedSemaphore(_BATCH_WORKERS)
+
+
+def get_alert_recommender(model: str = "gemini-2.0-flash") -> "GeminiAlertRecommender":
+    """
+    Returns the process-wide recommender for `model`, creating it on first use so the
+    LangChain client and its connections are reused across requests.
+    """
+    recommender = _recommenders.get(model)
+    if recommender is None:
+        with _recommenders_lock:
+            recommender = _recommenders.get(model)
+            if recommender is None:
+                recommender = GeminiAlertRecommender(model=model)
+                _recommenders[model] = recommender
+    return recommender
+
 
 class GeminiAlertRecommender:
     """
@@ -37,7 +64,11 @@ class GeminiAlertRecommender:
             temperature=0.9,
             top_k=40,
             top_p=0.95,
-            max_output_tokens=150
+            max_output_tokens=150,
+            # A batch abandoned at the deadline still holds a worker until its calls return,
+            # so each call is bounded by the deadline too and not retried
+            timeout=RECOMMENDATION_DEADLINE_SECONDS,
+            max_retries=0
         )
 
         # Create prompt template
@@ -73,12 +104,15 @@ Instructions based on alert type:
 
 Provide ONE clear, actionable and impactful in real world scenario recommendation following these guidelines."""
 
-    def generate_recommendations(self, alerts_data: Dict[str, Any]) -> Dict[str, Any]:
+    def generate_recommendations(self, alerts_data: Dict[str, Any],
+                                 deadline: Optional[float] = RECOMMENDATION_DEADLINE_SECONDS) -> Dict[str, Any]:
         """
         Generate LLM-based recommendations for alerts using LangChain.
 
         Args:
             alerts_data: Dictionary containing alerts in the format from your API
+            deadline: Seconds to wait for all recommendations; alert types still pending
+                keep their original recommendation
 
         Returns:
             Updated alerts data with LLM-generated recommendations
@@ -88,13 +122,8 @@ Provide ONE clear, actionable and impactful in real world scenario recommendatio
         # Group alerts by type for better context
         alerts_by_type = self._group_alerts_by_type(alerts_list)
 
-        # Generate recommendations for each alert type
-        recommendations_by_type = {}
-
-        for alert_type, alerts in alerts_by_type.items():
-            print(f"Generating recommendations for {alert_type}...")
-            recommendation = self._get_llm_recommendation(alert_type, alerts)
-            recommendations_by_type[alert_type] = recommendation
+        # Generate recommendations for all alert types in one batched call
+        recommendations_by_type = self._get_llm_recommendations(alerts_by_type, deadline)
 
         # Update original alerts with new recommendations
         updated_alerts = []
@@ -130,40 +159,63 @@ Provide ONE clear, actionable and impactful in real world scenario recommendatio
             grouped[alert_type].append(alert)
         return grouped
 
-    def _get_llm_recommendation(self, alert_type: str, alerts: List[Dict]) -> str:
+    def _get_llm_recommendations(self, alerts_by_type: Dict[str, List[Dict]],
+                                 deadline: Optional[float]) -> Dict[str, str]:
         """
-        Get recommendation from Gemini LLM using LangChain for a specific alert type.
+        Fan all alert types out concurrently through the chain's batch API under one global deadline.
+        If every worker is still busy with earlier batches, nothing is sent.
 
         Args:
-            alert_type: Type of alert (e.g., "Missing Person", "Overcrowding")
-            alerts: List of alerts of this type
+            alerts_by_type: Alerts grouped by alert_type
+            deadline: Seconds to wait for the whole batch (None waits indefinitely)
 
         Returns:
-            LLM-generated recommendation string
+            Recommendation per alert type; types that failed or missed the deadline are omitted
         """
-        # Prepare context for the LLM
-        context = self._prepare_context(alert_type, alerts)
+        if not alerts_by_type:
+            return {}
 
-        # Call LangChain chain
-        try:
-            # --- THIS IS CHANGED ---
-            # The new LCEL chain directly returns a string, not a dictionary
-            response_str = self.chain.invoke({
+        alert_types = list(alerts_by_type)
+        print(f"Generating recommendations for {', '.join(alert_types)}...")
+        inputs = [
+            {
                 "alert_type": alert_type,
-                "count": len(alerts),
-                "context": context
-            })
-
-            # Extract the generated text
-            if response_str:
-                return response_str.strip()  # The response is already the text
-            else:
-                return f"Unable to generate recommendation for {alert_type}."
-            # --- END CHANGE ---
-
+                "count": len(alerts_by_type[alert_type]),
+                "context": self._prepare_context(alert_type, alerts_by_type[alert_type])
+            }
+            for alert_type in alert_types
+        ]
+
+        if not _batch_slots.acquire(blocking=False):
+            print("Gemini recommenders are busy; keeping the stored recommendations.")
+            return {}
+        try:
+            future = _batch_executor.submit(
+                self.chain.batch,
+                inputs,
+                config={"max_concurrency": len(inputs)},
+                return_exceptions=True
+            )
+        except Exception:
+            _batch_slots.release()
+            raise
+        future.add_done_callback(lambda _: _batch_slots.release())
+        try:
+            responses = future.result(timeout=deadline)
+        except FutureTimeoutError:
+            print(f"Gemini recommendations exceeded the {deadline}s deadline.")
+            return {}
         except Exception as e:
             print(f"Error calling Gemini via LangChain: {e}")
-            return f"Error generating recommendation: {str(e)}"
+            return {}
+
+        recommendations = {}
+        for alert_type, response_str in zip(alert_types, responses):
+            if isinstance(response_str, Exception):
+                print(f"Error generating recommendation for {alert_type}: {response_str}")
+            elif response_str:
+                recommendations[alert_type] = response_str.strip()
+        return recommendations
 
     def _prepare_context(self, alert_type: str, alerts: List[Dict]) -> str:
         """Prepare relevant context from alerts for the LLM."""
@@ -218,6 +270,7 @@ Provide ONE clear, actionable and impactful in real world scenario recommendatio
 
         else:
             # Generic context for other alert types
-            context = f"Number of incidents: {len(alerts)}\nSeverity: {alerts[0].get('severity', 'N/A')}"
+            occurrences = sum(alert.get('occurrences', 1) for alert in alerts)
+            context = f"Number of incidents: {len(alerts)} ({occurrences} events)\nSeverity: {alerts[0].get('severity', 'N/A')}"
 
         return context
\ No newline at end of file
@@ -0,0 +1,78 @@
+from django.conf import settings
+from django.db import connection
+from .models import EVENT_TYPE_CHOICES
+
+_TYPE_COUNTS = ", ".join(
+    f"'{event_type}', NULLIF(COUNT(*) FILTER (WHERE e.event_type = '{event_type}'), 0)"
+    for event_type, _ in EVENT_TYPE_CHOICES
+)
+
+# One rollup row per (entity, campus day) of the selected events
+_ACTIVITY_SQL = f"""
+    INSERT INTO entity_daily_activity (entity_id, day, first_seen, last_seen, event_count, event_counts, locations)
+    SELECT e.entity_id, (e.timestamp AT TIME ZONE %(tz)s)::date AS day,
+           MIN(e.timestamp), MAX(e.timestamp), COUNT(*),
+           jsonb_strip_nulls(jsonb_build_object({_TYPE_COUNTS})),
+           COALESCE(array_agg(DISTINCT e.location ORDER BY e.location) FILTER (WHERE e.location IS NOT NULL), ARRAY[]::varchar[])
+    FROM events e
+    {{source}}
+    WHERE e.entity_id IS NOT NULL {{condition}}
+    GROUP BY 1, 2
+    ON CONFLICT (entity_id, day) DO UPDATE
+    SET first_seen = EXCLUDED.first_seen,
+        last_seen = EXCLUDED.last_seen,
+        event_count = EXCLUDED.event_count,
+        event_counts = EXCLUDED.event_counts,
+        locations = EXCLUDED.locations
+"""
+
+# Profile.last_seen follows the latest rollup row of the selected entities
+_LAST_SEEN_SQL = """
+    UPDATE profiles p
+    SET last_seen = (SELECT MAX(a.last_seen) FROM entity_daily_activity a WHERE a.entity_id = p.entity_id)
+    {condition}
+"""
+
+
+def refresh_activity(since):
+    """
+    Recomputes every (entity, day) rollup that received events created at or after `since`,
+    and the last_seen of the entities involved.
+    """
+    params = {"since": since, "tz": settings.CAMPUS_TIME_ZONE}
+    with connection.cursor() as cursor:
+        cursor.execute(_ACTIVITY_SQL.format(
+            source="""
+                JOIN (
+                    SELECT DISTINCT entity_id, (timestamp AT TIME ZONE %(tz)s)::date AS day
+                    FROM events
+                    WHERE created_at >= %(since)s AND entity_id IS NOT NULL
+                ) a ON a.entity_id = e.entity_id
+                   AND e.timestamp >= a.day::timestamp AT TIME ZONE %(tz)s
+                   AND e.timestamp < (a.day + 1)::timestamp AT TIME ZONE %(tz)s
+            """,
+            condition=""
+        ), params)
+        written = cursor.rowcount
+        cursor.execute(_LAST_SEEN_SQL.format(
+            condition="WHERE p.entity_id IN (SELECT entity_id FROM events WHERE created_at >= %(since)s)"
+        ), params)
+        return written
+
+
+def rebuild_activity(entity_ids=None):
+    """Recomputes the rollups and last_seen of the given entities, or of everyone, from the raw events."""
+    params = {"tz": settings.CAMPUS_TIME_ZONE, "entity_ids": list(entity_ids) if entity_ids is not None else None}
+    with connection.cursor() as cursor:
+        if entity_ids is None:
+            cursor.execute("TRUNCATE entity_daily_activity")
+            condition = ""
+        else:
+            cursor.execute("DELETE FROM entity_daily_activity WHERE entity_id = ANY(%(entity_ids)s)", params)
+            condition = "AND e.entity_id = ANY(%(entity_ids)s)"
+        cursor.execute(_ACTIVITY_SQL.format(source="", condition=condition), params)
+        written = cursor.rowcount
+        cursor.execute(_LAST_SEEN_SQL.format(
+            condition="" if entity_ids is None else "WHERE p.entity_id = ANY(%(entity_ids)s)"
+        ), params)
+        return written
@@ -9,6 +9,11 @@ from .models import (
     LabBooking,
     LibraryCheckout,
     FaceEmbedding,
+    Alert,
+    AccessRule,
+    AfterHoursWindow,
+    LocationCapacity,
+    TimelineSummary,
 )
 
 
@@ -226,4 +231,45 @@ class FaceEmbeddingAdmin(admin.ModelAdmin):
             return "[" + ", ".join(f"{v:.3f}" for v in vals) + ", ...]"
         except Exception:
             return "(embedding)"
-    embedding_preview.short_description = "Embedding (preview)"
\ No newline at end of file
+    embedding_preview.short_description = "Embedding (preview)"
+
+@admin.register(Alert)
+class AlertAdmin(admin.ModelAdmin):
+    list_display = ("id", "alert_type", "severity", "entity", "location", "occurred_at")
+    search_fields = ("fingerprint", "message", "entity__name", "entity__entity_id", "location")
+    list_filter = ("alert_type", "severity")
+    date_hierarchy = "occurred_at"
+    raw_id_fields = ("entity",)
+    readonly_fields = ("created_at", "updated_at")
+
+
+@admin.register(AccessRule)
+class AccessRuleAdmin(admin.ModelAdmin):
+    list_display = ("location", "role")
+    list_filter = ("role",)
+    search_fields = ("location",)
+    ordering = ("location", "role")
+
+
+@admin.register(AfterHoursWindow)
+class AfterHoursWindowAdmin(admin.ModelAdmin):
+    list_display = ("location", "start_hour", "end_hour")
+    search_fields = ("location",)
+    ordering = ("location",)
+
+
+@admin.register(LocationCapacity)
+class LocationCapacityAdmin(admin.ModelAdmin):
+    list_display = ("location_id", "max_capacity")
+    search_fields = ("location_id",)
+    ordering = ("location_id",)
+
+
+@admin.register(TimelineSummary)
+class TimelineSummaryAdmin(admin.ModelAdmin):
+    list_display = ("id", "entity", "start_time", "end_time", "status", "updated_at")
+    search_fields = ("entity__name", "entity__entity_id")
+    list_filter = ("status",)
+    date_hierarchy = "start_time"
+    raw_id_fields = ("entity",)
+    readonly_fields = ("created_at", "updated_at")
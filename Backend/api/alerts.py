@@ -0,0 +1,562 @@
+import base64
+import json
+from datetime import datetime, timedelta
+from itertools import islice
+from zoneinfo import ZoneInfo
+import numpy as np
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Exists, Max, Min, OuterRef, Q
+from django.utils import timezone
+from . import gap_detection, presence
+from .clock import default_clock
+from .models import AccessRule, AfterHoursWindow, Alert, AlertWatermark, Event, LocalHour, LocationCapacity, OccupancyData, Profile
+
+AFTER_HOURS_ROLES = ['staff', 'student']
+
+# Most over-capacity samples reported per location and evaluation run
+OVERCROWDING_TOP_K = 10
+
+GAP_THRESHOLD = timedelta(hours=10)
+# Repeated events of one entity in one location closer than this form a single incident
+INCIDENT_GAP = timedelta(minutes=30)
+# Gaps are only searched this far back from the first new event of an entity
+GAP_LOOKBACK = timedelta(days=4)
+WATERMARK_NAME = "alerts"
+# created_at is set when a row is written, not when it commits; transactions are assumed to
+# commit within this long, and events created that close to the previous run are read again
+WATERMARK_OVERLAP = timedelta(minutes=10)
+# Occupancy rows can be selected by insertion order (live runs) or by sample time (replays)
+OCCUPANCY_BOUND_COLUMNS = ("id", "start_time")
+
+
+class AlertEvaluator:
+    """
+    Materializes campus alerts into the `alerts` table.
+
+    Each run only looks at events created, and occupancy rows inserted, after the stored
+    watermark (events created within WATERMARK_OVERLAP of the previous run are read again,
+    in case they committed after it). Alerts are derived
+    from the events themselves and upserted on their fingerprint, so re-processing the same
+    rows is harmless and the read path never has to touch the raw event tables.
+
+    `clock` decides what "now" is: events after clock.now() are treated as not having
+    happened yet, which lets a replay drive the evaluators through historical data.
+    """
+
+    def __init__(self, gap_threshold=GAP_THRESHOLD, gap_lookback=GAP_LOOKBACK,
+                 overcrowding_top_k=OVERCROWDING_TOP_K, merge_overcrowding=False, incident_gap=INCIDENT_GAP,
+                 clock=None):
+        self.gap_threshold = gap_threshold
+        self.gap_lookback = gap_lookback
+        self.overcrowding_top_k = overcrowding_top_k
+        self.merge_overcrowding = merge_overcrowding
+        self.incident_gap = incident_gap
+        self.clock = clock or default_clock()
+
+    def run(self):
+        """Evaluates everything past the watermark and returns per-type alert counts."""
+        with transaction.atomic():
+            watermark, _ = AlertWatermark.objects.select_for_update().get_or_create(name=WATERMARK_NAME)
+
+            since = None
+            if watermark.events_created_at:
+                # Everything created before the previous run minus the overlap had committed by then
+                since = min(watermark.events_created_at, watermark.updated_at - WATERMARK_OVERLAP)
+            new_events = Event.objects.filter(entity__isnull=False)
+            if since:
+                new_events = new_events.filter(created_at__gt=since)
+            latest_created = new_events.aggregate(latest=Max("created_at"))["latest"]
+            if latest_created:
+                new_events = new_events.filter(created_at__lte=latest_created)
+                # Cheap and idempotent; keeps gap candidates complete if the importer has not synced yet
+                presence.refresh_presence(since)
+
+            latest_occupancy = OccupancyData.objects.filter(
+                id__gt=watermark.occupancy_id
+            ).aggregate(latest=Max("id"))["latest"]
+
+            stats = self.evaluate(
+                new_events if latest_created else None,
+                ("id", watermark.occupancy_id, latest_occupancy) if latest_occupancy else None
+            )
+
+            watermark.events_created_at = max(filter(None, [latest_created, watermark.events_created_at]), default=None)
+            watermark.occupancy_id = latest_occupancy or watermark.occupancy_id
+            watermark.save()
+
+        return stats
+
+    def evaluate(self, new_events, occupancy_bounds):
+        """
+        Runs every rule over one batch and returns per-type alert counts.
+
+        Args:
+            new_events: Event queryset of the batch, or None if there are no new events
+            occupancy_bounds: (column, lower, upper) selecting occupancy rows with
+                lower < column <= upper, or None if there are no new rows
+        """
+        return {
+            "missing_person": self.evaluate_missing_person(new_events) if new_events is not None else 0,
+            "overcrowding": self.evaluate_overcrowding(*occupancy_bounds[1:], column=occupancy_bounds[0]) if occupancy_bounds else 0,
+            "access_violation": self.evaluate_access_violations(new_events) if new_events is not None else 0,
+            "after_hours": self.evaluate_after_hours(new_events) if new_events is not None else 0,
+        }
+
+    def evaluate_missing_person(self, new_events):
+        first_new = dict(
+            new_events.order_by().values("entity_id").annotate(first=Min("timestamp")).values_list("entity_id", "first")
+        )
+        if not first_new:
+            return 0
+
+        entity_ids = list(first_new)
+        lower = min(first_new.values()) - self.gap_lookback
+        now = self.clock.now()
+        gaps = self._find_gaps(entity_ids, lower, now)
+
+        names = dict(Profile.objects.filter(
+            entity_id__in={entity_id for entity_id, *_ in gaps}
+        ).values_list("entity_id", "name"))
+
+        alerts = []
+        for entity_id, gap_start, gap_end, gap_seconds, total_seconds in gaps:
+            gap_hours = gap_seconds / 3600
+            total_gap_hours = total_seconds / 3600
+            alerts.append(Alert(
+                fingerprint=f"missing_person:{entity_id}:{gap_start.isoformat()}",
+                alert_type="missing_person",
+                severity=10,
+                entity_id=entity_id,
+                occurred_at=gap_start,
+                last_seen_at=gap_end,
+                message=f"{names.get(entity_id)} had no activity for {gap_hours:.1f} hours (from {gap_start.strftime('%Y-%m-%d %H:%M')} to {gap_end.strftime('%Y-%m-%d %H:%M')}, excluding sleeping hours).",
+                details={
+                    "entity_id": str(entity_id),
+                    "name": names.get(entity_id),
+                    "gap_start": gap_start,
+                    "gap_end": gap_end,
+                    "gap_hours": round(gap_hours, 1),
+                    "total_gap_hours": round(total_gap_hours, 1)
+                },
+                recommendation="Investigate unusual absence pattern."
+            ))
+
+        # A late event can split an earlier gap; drop alerts that were not re-derived
+        Alert.objects.filter(
+            alert_type="missing_person",
+            entity_id__in=entity_ids,
+            occurred_at__gte=lower
+        ).exclude(fingerprint__in=[alert.fingerprint for alert in alerts]).delete()
+
+        return self._upsert(alerts)
+
+    def _find_gaps(self, entity_ids, lower, upper):
+        """
+        Gaps of at least gap_threshold (sleeping hours excluded) between consecutive events
+        of the given entities in [lower, upper], as (entity_id, start, end, gap_seconds,
+        total_seconds) tuples.
+
+        Candidates come from the daily presence bitmaps: a gap can only be as long as its
+        run of empty slots plus the two slots around it. Only those candidates are resolved
+        to exact event timestamps, in one query.
+        """
+        tz = ZoneInfo(settings.CAMPUS_TIME_ZONE)
+        first_day = timezone.localtime(lower, tz).date()
+        matrix = presence.load_presence(entity_ids, first_day, timezone.localtime(upper, tz).date())
+        matrix[:, :presence.slot_position(lower, first_day, tz)] = False
+        matrix[:, presence.slot_position(upper, first_day, tz) + 1:] = False
+
+        rows, starts, ends, awake_slots = presence.absence_runs(matrix)
+        candidates = np.flatnonzero(
+            (awake_slots + 2) * presence.SLOT_SECONDS >= self.gap_threshold.total_seconds()
+        )
+        if not len(candidates):
+            return []
+
+        bounds = presence.gap_bounds(
+            [entity_ids[row] for row in rows[candidates]],
+            [presence.slot_start(start, first_day, tz) for start in starts[candidates]],
+            [presence.slot_start(end, first_day, tz) for end in ends[candidates]],
+            lower,
+            upper
+        )
+        if not bounds:
+            return []
+
+        found = sorted(bounds)
+        gap_starts = [bounds[i][0] for i in found]
+        gap_ends = [bounds[i][1] for i in found]
+        local_starts = gap_detection.to_local_seconds(gap_starts, tz=tz)
+        local_ends = gap_detection.to_local_seconds(gap_ends, tz=tz)
+        total = local_ends - local_starts
+        gap_seconds = total - gap_detection.sleep_overlap(local_starts, local_ends)
+
+        return [
+            (entity_ids[rows[candidates[i]]], gap_starts[k], gap_ends[k], int(gap_seconds[k]), int(total[k]))
+            for k, i in enumerate(found)
+            if gap_seconds[k] >= self.gap_threshold.total_seconds()
+        ]
+
+    def evaluate_overcrowding(self, lower, upper, column="id"):
+        if self.merge_overcrowding:
+            return self._evaluate_overcrowding_intervals(lower, upper, column)
+
+        alerts = []
+        for entry in overcrowding_samples(lower, upper, top_k=self.overcrowding_top_k, column=column):
+            location_id = entry["location_id"]
+            max_capacity = entry["max_capacity"]
+            overage_pct = ((entry["count"] - max_capacity) / max_capacity) * 100
+            alerts.append(Alert(
+                fingerprint=f"overcrowding:{location_id}:{entry['start_time'].isoformat()}",
+                alert_type="overcrowding",
+                severity=min(8, 5 + int(overage_pct / 20)),
+                location=location_id,
+                occurred_at=entry["start_time"],
+                last_seen_at=entry["start_time"],
+                message=f"{location_id} was over capacity by {int(overage_pct)}% at {entry['start_time'].strftime('%Y-%m-%d %H:%M')}.",
+                details={
+                    "location_name": location_id,
+                    "current_count": entry["count"],
+                    "max_capacity": max_capacity,
+                    "timestamp": entry["start_time"]
+                },
+                recommendation="Monitor area and redirect traffic."
+            ))
+
+        return self._upsert(alerts)
+
+    def _evaluate_overcrowding_intervals(self, lower, upper, column):
+        intervals = overcrowding_intervals(lower, upper, column=column, until=self.clock.now())
+        alerts = []
+        for entry in intervals:
+            location_id = entry["location_id"]
+            max_capacity = entry["max_capacity"]
+            overage_pct = ((entry["peak_count"] - max_capacity) / max_capacity) * 100
+            alerts.append(Alert(
+                fingerprint=f"overcrowding:{location_id}:{entry['start_time'].isoformat()}",
+                alert_type="overcrowding",
+                severity=min(8, 5 + int(overage_pct / 20)),
+                location=location_id,
+                occurred_at=entry["start_time"],
+                last_seen_at=entry["end_time"],
+                occurrences=entry["samples"],
+                message=f"{location_id} was over capacity from {entry['start_time'].strftime('%Y-%m-%d %H:%M')} to {entry['end_time'].strftime('%Y-%m-%d %H:%M')}, peaking {int(overage_pct)}% over.",
+                details={
+                    "location_name": location_id,
+                    "current_count": entry["peak_count"],
+                    "max_capacity": max_capacity,
+                    "timestamp": entry["start_time"],
+                    "interval_end": entry["end_time"],
+                    "samples": entry["samples"]
+                },
+                recommendation="Monitor area and redirect traffic."
+            ))
+
+        # Intervals of the affected locations are recomputed as a whole, so new rows may merge old ones
+        Alert.objects.filter(
+            alert_type="overcrowding",
+            location__in={entry["location_id"] for entry in intervals}
+        ).exclude(fingerprint__in=[alert.fingerprint for alert in alerts]).delete()
+
+        return self._upsert(alerts)
+
+    def evaluate_access_violations(self, new_events):
+        # Anti-join: events in a restricted location with no rule allowing the entity's role
+        allowed = AccessRule.objects.filter(location=OuterRef("location"), role=OuterRef("entity__role"))
+
+        def violations(events):
+            return events.filter(
+                location__in=AccessRule.objects.values("location"),
+                entity__role__isnull=False
+            ).filter(
+                ~Exists(allowed)
+            )
+
+        def describe(first, incident):
+            return f"{first['entity__name']} ({first['entity__role']}) entered restricted area: {first['location']}."
+
+        return self._upsert(self._incident_alerts(
+            "access_violation",
+            new_events,
+            violations,
+            severity=7,
+            describe=describe,
+            recommendation="Verify entity credentials. Dispatch security if necessary."
+        ))
+
+    def evaluate_after_hours(self, new_events):
+        windows = Q()
+        for window in AfterHoursWindow.objects.all():
+            if window.start_hour <= window.end_hour:
+                in_window = Q(local_hour__gte=window.start_hour, local_hour__lt=window.end_hour)
+            else:
+                in_window = Q(local_hour__gte=window.start_hour) | Q(local_hour__lt=window.end_hour)
+            windows |= Q(location=window.location) & in_window
+        if not windows:
+            return 0
+
+        def after_hours_events(events):
+            # Hour predicate matches events_location_local_hour_idx
+            return events.annotate(
+                local_hour=LocalHour("timestamp", tz=settings.CAMPUS_TIME_ZONE)
+            ).filter(
+                windows,
+                entity__role__in=AFTER_HOURS_ROLES
+            )
+
+        campus_tz = ZoneInfo(settings.CAMPUS_TIME_ZONE)
+
+        def describe(first, incident):
+            return f"{first['entity__name']} ({first['entity__role']}) accessed {first['location']} during restricted hours at {incident['first_seen'].astimezone(campus_tz).strftime('%Y-%m-%d %H:%M')}."
+
+        return self._upsert(self._incident_alerts(
+            "after_hours",
+            new_events,
+            after_hours_events,
+            severity=6,
+            describe=describe,
+            recommendation="Verify authorization for after-hours access."
+        ))
+
+    def _incident_alerts(self, alert_type, new_events, matching, severity, describe, recommendation):
+        """
+        One alert per incident touched by the new events that `matching` selects.
+
+        The incidents of the affected entities are recomputed from all their matching events
+        in a span widened to cover every stored incident it meets, streamed from a server-side
+        cursor sorted by (entity, location, timestamp). A recomputed incident keeps the
+        fingerprint of the earliest stored incident it contains, and stored incidents merged
+        into another one by late events are deleted, so re-processing the same events leaves
+        the table unchanged.
+        """
+        new_matches = matching(new_events)
+        span = new_matches.aggregate(earliest=Min("timestamp"), latest=Max("timestamp"))
+        if span["earliest"] is None:
+            return
+        entity_ids = list(new_matches.order_by().values_list("entity_id", flat=True).distinct())
+        lower, upper = self._incident_span(alert_type, entity_ids, span["earliest"], span["latest"])
+
+        stored = {}
+        for alert in Alert.objects.filter(
+            alert_type=alert_type,
+            entity_id__in=entity_ids,
+            occurred_at__lte=upper,
+            last_seen_at__gte=lower
+        ).order_by("occurred_at"):
+            stored.setdefault((alert.entity_id, alert.location), []).append(alert)
+
+        rows = matching(
+            Event.objects.filter(entity_id__in=entity_ids, timestamp__gte=lower, timestamp__lte=upper)
+        ).order_by("entity_id", "location", "timestamp").values(
+            "entity__entity_id", "entity__name", "entity__role", "timestamp", "location"
+        ).iterator(chunk_size=2000)
+
+        emitted = set()
+        for incident in coalesce_incidents(rows, self.incident_gap):
+            first = incident["first"]
+            entity_id, location = incident["key"]
+            fingerprint = f"{alert_type}:{entity_id}:{location}:{incident['first_seen'].isoformat()}"
+
+            existing = next((
+                alert for alert in stored.get(incident["key"], [])
+                if alert.fingerprint not in emitted
+                and (alert.fingerprint == fingerprint
+                     or alert.occurred_at <= incident["last_seen"] and alert.last_seen_at >= incident["first_seen"])
+            ), None)
+            if existing:
+                fingerprint = existing.fingerprint
+                incident["first_seen"] = min(incident["first_seen"], existing.occurred_at)
+                incident["last_seen"] = max(incident["last_seen"], existing.last_seen_at)
+            emitted.add(fingerprint)
+
+            message = describe(first, incident)
+            if incident["count"] > 1:
+                message += f" Seen {incident['count']} times until {incident['last_seen'].strftime('%Y-%m-%d %H:%M')}."
+
+            yield Alert(
+                fingerprint=fingerprint,
+                alert_type=alert_type,
+                severity=severity,
+                entity_id=entity_id,
+                location=location,
+                occurred_at=incident["first_seen"],
+                last_seen_at=incident["last_seen"],
+                occurrences=incident["count"],
+                message=message,
+                details={
+                    "entity_id": str(entity_id),
+                    "name": first["entity__name"],
+                    "role": first["entity__role"],
+                    "location": location,
+                    "timestamp": incident["first_seen"],
+                    "last_seen": incident["last_seen"],
+                    "occurrences": incident["count"]
+                },
+                recommendation=recommendation
+            )
+
+        # Stored incidents that late events merged into an earlier one
+        Alert.objects.filter(id__in=[
+            alert.id for alerts in stored.values() for alert in alerts if alert.fingerprint not in emitted
+        ]).delete()
+
+    def _incident_span(self, alert_type, entity_ids, lower, upper):
+        """
+        Widens [lower, upper] until every stored incident of the entities that lies within
+        incident_gap of it is fully inside, so recomputing the span never cuts one in two.
+        """
+        stored = Alert.objects.filter(alert_type=alert_type, entity_id__in=entity_ids)
+        while True:
+            reached = stored.filter(
+                occurred_at__lte=upper + self.incident_gap,
+                last_seen_at__gte=lower - self.incident_gap
+            ).aggregate(first=Min("occurred_at"), last=Max("last_seen_at"))
+            if reached["first"] is None or (reached["first"] >= lower and reached["last"] <= upper):
+                return lower, upper
+            lower = min(lower, reached["first"])
+            upper = max(upper, reached["last"])
+
+    def _upsert(self, alerts, batch_size=1000):
+        """Upserts alerts in batches, so generators are never fully materialized."""
+        alerts = iter(alerts)
+        total = 0
+        while batch := list(islice(alerts, batch_size)):
+            Alert.objects.bulk_create(
+                batch,
+                update_conflicts=True,
+                unique_fields=["fingerprint"],
+                update_fields=["severity", "occurred_at", "last_seen_at", "occurrences", "message", "details", "updated_at"]
+            )
+            total += len(batch)
+        return total
+
+
+def coalesce_incidents(events, gap):
+    """
+    One pass over events sorted by (entity, location, timestamp): consecutive events of the
+    same entity and location no more than `gap` apart form one incident.
+    """
+    current = None
+    for event in events:
+        key = (event["entity__entity_id"], event["location"])
+        if current and current["key"] == key and event["timestamp"] - current["last_seen"] <= gap:
+            current["last_seen"] = event["timestamp"]
+            current["count"] += 1
+            continue
+        if current:
+            yield current
+        current = {
+            "key": key,
+            "first": event,
+            "first_seen": event["timestamp"],
+            "last_seen": event["timestamp"],
+            "count": 1,
+        }
+    if current:
+        yield current
+
+
+def location_capacities():
+    return dict(LocationCapacity.objects.order_by("location_id").values_list("location_id", "max_capacity"))
+
+
+def _occupancy_bound_column(column):
+    if column not in OCCUPANCY_BOUND_COLUMNS:
+        raise ValueError(f"Cannot bound occupancy rows on {column!r}")
+    return column
+
+
+def overcrowding_samples(lower, upper, top_k=OVERCROWDING_TOP_K, column="id"):
+    """
+    Top-k over-capacity occupancy samples of every location with `column` in (lower, upper],
+    fetched in a single round trip.
+    """
+    column = _occupancy_bound_column(column)
+    with connection.cursor() as cursor:
+        cursor.execute(f"""
+            SELECT location_id, start_time, count, max_capacity
+            FROM (
+                SELECT o.location_id, o.start_time, o.count, c.max_capacity,
+                       ROW_NUMBER() OVER (PARTITION BY o.location_id ORDER BY o.count DESC) AS rank
+                FROM occupancy_data o
+                JOIN location_capacities c ON c.location_id = o.location_id
+                WHERE o.{column} > %s AND o.{column} <= %s AND o.count > c.max_capacity
+            ) ranked
+            WHERE rank <= %s
+            ORDER BY location_id, rank
+        """, [lower, upper, top_k])
+        columns = [col[0] for col in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+def overcrowding_intervals(lower, upper, column="id", until=None):
+    """
+    Merges consecutive over-capacity samples into intervals (gaps-and-islands) for every
+    location that received rows with `column` in (lower, upper]. Samples after `until`
+    are ignored.
+    """
+    column = _occupancy_bound_column(column)
+    with connection.cursor() as cursor:
+        cursor.execute(f"""
+            WITH samples AS (
+                SELECT o.location_id, o.start_time, o.count, c.max_capacity,
+                       o.count > c.max_capacity AS over_capacity,
+                       ROW_NUMBER() OVER (PARTITION BY o.location_id ORDER BY o.start_time)
+                       - ROW_NUMBER() OVER (PARTITION BY o.location_id, o.count > c.max_capacity ORDER BY o.start_time) AS island
+                FROM occupancy_data o
+                JOIN location_capacities c ON c.location_id = o.location_id
+                WHERE o.location_id IN (
+                    SELECT DISTINCT location_id FROM occupancy_data WHERE {column} > %s AND {column} <= %s
+                )
+                AND (%s::timestamptz IS NULL OR o.start_time <= %s::timestamptz)
+            )
+            SELECT location_id, max_capacity,
+                   MIN(start_time) AS start_time,
+                   MAX(start_time) AS end_time,
+                   MAX(count) AS peak_count,
+                   COUNT(*) AS samples
+            FROM samples
+            WHERE over_capacity
+            GROUP BY location_id, max_capacity, island
+            ORDER BY location_id, start_time
+        """, [lower, upper, until, until])
+        columns = [col[0] for col in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+def reset_alerts():
+    """Drops all materialized alerts and the watermark so the next run starts from scratch."""
+    with transaction.atomic():
+        Alert.objects.all().delete()
+        AlertWatermark.objects.filter(name=WATERMARK_NAME).delete()
+
+
+def alert_to_dict(alert):
+    return {
+        "id": alert.id,
+        "occurred_at": alert.occurred_at,
+        "last_seen_at": alert.last_seen_at,
+        "occurrences": alert.occurrences,
+        "alert_type": alert.get_alert_type_display(),
+        "severity": alert.severity,
+        "message": alert.message,
+        "details": alert.details,
+        "recommendation": alert.recommendation,
+    }
+
+
+def encode_alert_cursor(alert):
+    """Opaque keyset cursor pointing just past `alert` in (occurred_at, id) descending order."""
+    raw = json.dumps([alert.occurred_at.isoformat(), alert.id])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_alert_cursor(cursor):
+    """Returns (occurred_at, id); raises ValueError for malformed cursors."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        occurred_at, alert_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(occurred_at), int(alert_id)
+    except (TypeError, ValueError, UnicodeDecodeError, base64.binascii.Error) as e:
+        raise ValueError("Invalid cursor") from e
@@ -1,6 +1,23 @@
 from django.apps import AppConfig
+from django.conf import settings
+from django.core import checks
+
+
+def check_local_hour_index(app_configs, **kwargs):
+    from .models import LOCAL_HOUR_INDEX_TIME_ZONE
+    if settings.CAMPUS_TIME_ZONE == LOCAL_HOUR_INDEX_TIME_ZONE:
+        return []
+    return [checks.Warning(
+        f"CAMPUS_TIME_ZONE is {settings.CAMPUS_TIME_ZONE!r} but events_location_local_hour_idx is built "
+        f"for {LOCAL_HOUR_INDEX_TIME_ZONE!r}; after-hours alerts stay correct but cannot use the index.",
+        hint="Change LOCAL_HOUR_INDEX_TIME_ZONE in api/models.py and generate a migration to rebuild the index.",
+        id="api.W001",
+    )]
 
 
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        checks.register(check_local_hour_index)
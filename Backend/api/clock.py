@@ -0,0 +1,41 @@
+from datetime import datetime
+from django.conf import settings
+from django.utils import timezone
+
+
+class SystemClock:
+    """Wall-clock time; what the alert pipeline uses in production."""
+
+    def now(self):
+        return timezone.now()
+
+
+class ManualClock:
+    """
+    A clock that only moves when told to. Replays advance it window by window, and a
+    deployment can pin it to a fixed moment to evaluate a frozen dataset.
+    """
+
+    def __init__(self, now):
+        self._now = now
+
+    def now(self):
+        return self._now
+
+    def set(self, now):
+        self._now = now
+
+
+def parse_moment(value):
+    moment = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def default_clock():
+    """SystemClock, or a clock frozen at ALERT_CLOCK_NOW when that setting is given."""
+    frozen = getattr(settings, "ALERT_CLOCK_NOW", None)
+    if frozen:
+        return ManualClock(parse_moment(frozen))
+    return SystemClock()
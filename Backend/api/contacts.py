@@ -0,0 +1,92 @@
+from django.db import connection
+from .models import Profile
+
+CONTACT_LIMIT = 50
+MAX_HOPS = 2
+
+
+def find_contacts(source_ids, start_time, end_time, window, exclude, limit=CONTACT_LIMIT):
+    """
+    Entities seen at the same location as any of `source_ids` within +-`window` of one of
+    their stays between start_time and end_time.
+
+    The sources' stays (stays index on entity, start_time) are interval-joined against
+    events of the same location (events index on location, timestamp). Overlap is the
+    time between a contact's first and last event inside each stay window, summed over
+    all windows. Returns up to `limit` contacts ranked by overlap, then by event count.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute("""
+            WITH windows AS (
+                SELECT entity_id AS source_id, location,
+                       start_time - %(window)s AS lower, end_time + %(window)s AS upper
+                FROM stays
+                WHERE entity_id = ANY(%(sources)s) AND start_time <= %(end)s AND end_time >= %(start)s
+            ), hits AS (
+                SELECT w.source_id, e.entity_id AS contact_id, w.location,
+                       MIN(e.timestamp) AS first_seen, MAX(e.timestamp) AS last_seen, COUNT(*) AS events
+                FROM windows w
+                JOIN events e ON e.location = w.location AND e.timestamp BETWEEN w.lower AND w.upper
+                WHERE e.entity_id IS NOT NULL AND NOT (e.entity_id = ANY(%(exclude)s))
+                GROUP BY w.source_id, e.entity_id, w.location, w.lower, w.upper
+            )
+            SELECT contact_id,
+                   SUM(EXTRACT(EPOCH FROM last_seen - first_seen))::float8 AS overlap_seconds,
+                   SUM(events)::bigint AS events,
+                   COUNT(*) AS encounters,
+                   MIN(first_seen) AS first_contact,
+                   MAX(last_seen) AS last_contact,
+                   array_agg(DISTINCT location) AS locations,
+                   array_agg(DISTINCT source_id) AS via
+            FROM hits
+            GROUP BY contact_id
+            ORDER BY overlap_seconds DESC, events DESC, contact_id
+            LIMIT %(limit)s
+        """, {
+            "sources": list(source_ids),
+            "exclude": list(exclude),
+            "start": start_time,
+            "end": end_time,
+            "window": window,
+            "limit": limit,
+        })
+        columns = [col[0] for col in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+def trace_contacts(entity_id, start_time, end_time, window, hops=1, limit=CONTACT_LIMIT):
+    """
+    Contacts of `entity_id` and, with hops=2, the contacts of those contacts. Each hop is a
+    single query; hop 2 starts from the ranked hop-1 contacts and never repeats an entity.
+    """
+    contacts = []
+    seen = {entity_id}
+    sources = [entity_id]
+    for hop in range(1, hops + 1):
+        found = find_contacts(sources, start_time, end_time, window, exclude=seen, limit=limit)
+        for contact in found:
+            contact["hop"] = hop
+        contacts.extend(found)
+        sources = [contact["contact_id"] for contact in found]
+        seen.update(sources)
+        if not sources:
+            break
+
+    profiles = Profile.objects.in_bulk({contact["contact_id"] for contact in contacts})
+    results = []
+    for contact in contacts:
+        profile = profiles.get(contact["contact_id"])
+        results.append({
+            "entity_id": contact["contact_id"],
+            "name": profile.name if profile else None,
+            "role": profile.role if profile else None,
+            "hop": contact["hop"],
+            "via": contact["via"],
+            "overlap_minutes": round(contact["overlap_seconds"] / 60, 1),
+            "events": contact["events"],
+            "encounters": contact["encounters"],
+            "first_contact": contact["first_contact"],
+            "last_contact": contact["last_contact"],
+            "locations": sorted(contact["locations"]),
+        })
+    return results
@@ -0,0 +1,317 @@
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+import numpy as np
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.utils import timezone
+from .models import FaceEmbedding, FaceEmbeddingDeletion
+
+logger = logging.getLogger(__name__)
+
+DIMENSIONS = 512
+LOAD_CHUNK_SIZE = 5000
+# Changed rows are re-read this far back, so rows committed late with an older
+# updated_at are not missed
+REFRESH_OVERLAP = timedelta(minutes=10)
+MANIFEST = "manifest.json"
+# Deletion tombstones are kept this long; older snapshots are reloaded instead of updated
+DELETION_RETENTION = timedelta(days=1)
+# Workers write their snapshot back to FACE_INDEX_PATH and prune tombstones this often
+SNAPSHOT_MAX_AGE = DELETION_RETENTION / 4
+# Advisory lock key that keeps writers of FACE_INDEX_PATH from interleaving
+SNAPSHOT_LOCK_KEY = 58_214_409
+
+
+def normalize(matrix):
+    """Rows scaled to unit length; zero rows stay zero and never match."""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms > 0)
+
+
+def searchable_rows():
+    """Face embeddings the search can return: with a vector and linked to a profile."""
+    return FaceEmbedding.objects.exclude(embedding=None).exclude(profile=None)
+
+
+class Gallery:
+    """
+    Immutable snapshot of the searchable embeddings.
+
+    `matrix` holds the rows present at load time (possibly a read-only memmap shared with
+    other workers), `live` masks the ones changed since, and the `delta_*` arrays hold
+    their current versions plus rows added after the load.
+    """
+
+    def __init__(self, matrix, face_ids, profile_ids, version, live=None,
+                 delta_matrix=None, delta_face_ids=None, delta_profile_ids=None):
+        self.matrix = matrix
+        self.face_ids = face_ids
+        self.profile_ids = profile_ids
+        self.version = version
+        self.live = np.ones(len(face_ids), dtype=bool) if live is None else live
+        self.delta_matrix = np.empty((0, DIMENSIONS), dtype=np.float32) if delta_matrix is None else delta_matrix
+        self.delta_face_ids = np.empty(0, dtype=object) if delta_face_ids is None else delta_face_ids
+        self.delta_profile_ids = np.empty(0, dtype=object) if delta_profile_ids is None else delta_profile_ids
+
+    def __len__(self):
+        return int(self.live.sum()) + len(self.delta_face_ids)
+
+    @classmethod
+    def from_database(cls):
+        version = timezone.now()
+        chunks, face_ids, profile_ids = [], [], []
+        rows = searchable_rows().order_by().values_list("face_id", "profile_id", "embedding").iterator(chunk_size=LOAD_CHUNK_SIZE)
+        while True:
+            chunk = [row for _, row in zip(range(LOAD_CHUNK_SIZE), rows)]
+            if not chunk:
+                break
+            ids, profiles, embeddings = zip(*chunk)
+            face_ids.extend(ids)
+            profile_ids.extend(profiles)
+            chunks.append(normalize(np.stack(embeddings)))
+        matrix = np.concatenate(chunks) if chunks else np.empty((0, DIMENSIONS), dtype=np.float32)
+        return cls(np.ascontiguousarray(matrix), np.array(face_ids, dtype=object), np.array(profile_ids, dtype=object), version)
+
+    @classmethod
+    def from_files(cls, path):
+        """Opens a gallery written by save(); the matrix is memory-mapped read-only."""
+        with open(os.path.join(path, MANIFEST)) as f:
+            manifest = json.load(f)
+        suffix = manifest["suffix"]
+        return cls(
+            np.load(os.path.join(path, f"embeddings-{suffix}.npy"), mmap_mode="r"),
+            np.load(os.path.join(path, f"face_ids-{suffix}.npy")).astype(object),
+            np.load(os.path.join(path, f"profile_ids-{suffix}.npy")).astype(object),
+            datetime.fromisoformat(manifest["version"])
+        )
+
+    def save(self, path):
+        """
+        Writes the gallery for from_files(). Arrays get a fresh suffix and the manifest is
+        replaced last, so workers never open a half-written set; old files are removed once
+        the manifest points elsewhere (mapped copies stay readable until released).
+        """
+        os.makedirs(path, exist_ok=True)
+        suffix = timezone.now().strftime("%Y%m%d%H%M%S%f")
+        live = np.flatnonzero(self.live)
+        matrix = np.concatenate([self.matrix[live], self.delta_matrix])
+        np.save(os.path.join(path, f"embeddings-{suffix}.npy"), matrix)
+        np.save(os.path.join(path, f"face_ids-{suffix}.npy"), np.concatenate([self.face_ids[live], self.delta_face_ids]).astype(str))
+        np.save(os.path.join(path, f"profile_ids-{suffix}.npy"), np.concatenate([self.profile_ids[live], self.delta_profile_ids]).astype(str))
+        tmp = os.path.join(path, MANIFEST + ".tmp")
+        with open(tmp, "w") as f:
+            json.dump({"suffix": suffix, "version": self.version.isoformat(), "count": len(matrix)}, f)
+        os.replace(tmp, os.path.join(path, MANIFEST))
+        for name in os.listdir(path):
+            if name.endswith(".npy") and not name.endswith(f"-{suffix}.npy"):
+                os.remove(os.path.join(path, name))
+        return len(matrix)
+
+    def updated(self, since):
+        """
+        A new snapshot with the rows changed or deleted since `since` folded into the delta.
+        Deletions come from the tombstones in face_embedding_deletions.
+        """
+        version = timezone.now()
+        changed = list(FaceEmbedding.objects.filter(
+            updated_at__gte=since - REFRESH_OVERLAP
+        ).values_list("face_id", "profile_id", "embedding"))
+        deleted = list(FaceEmbeddingDeletion.objects.filter(
+            deleted_at__gte=since - REFRESH_OVERLAP
+        ).values_list("face_id", flat=True))
+        if not changed and not deleted:
+            return Gallery(self.matrix, self.face_ids, self.profile_ids, version, self.live,
+                           self.delta_matrix, self.delta_face_ids, self.delta_profile_ids)
+
+        # A row deleted and inserted again is in both lists and ends up in the delta
+        changed_ids = np.array([face_id for face_id, _, _ in changed] + deleted, dtype=object)
+        kept = ~np.isin(self.delta_face_ids, changed_ids)
+        current = [(face_id, profile_id, embedding) for face_id, profile_id, embedding in changed
+                   if embedding is not None and profile_id is not None]
+        delta_matrix = self.delta_matrix[kept]
+        if current:
+            delta_matrix = np.concatenate([delta_matrix, normalize(np.stack([row[2] for row in current]))])
+        return Gallery(
+            self.matrix,
+            self.face_ids,
+            self.profile_ids,
+            version,
+            self.live & ~np.isin(self.face_ids, changed_ids),
+            delta_matrix,
+            np.concatenate([self.delta_face_ids[kept], np.array([row[0] for row in current], dtype=object)]),
+            np.concatenate([self.delta_profile_ids[kept], np.array([row[1] for row in current], dtype=object)]),
+        )
+
+    def ranked_profiles(self, embedding, k, threshold):
+        """Same result as face_search.ranked_profiles, from one matrix-vector product."""
+        query = normalize(embedding)
+        base_distances = 1 - self.matrix @ query
+        base = np.flatnonzero(self.live & (base_distances < threshold))
+        delta_distances = 1 - self.delta_matrix @ query
+        delta = np.flatnonzero(delta_distances < threshold)
+
+        distances = np.concatenate([base_distances[base], delta_distances[delta]])
+        face_ids = np.concatenate([self.face_ids[base], self.delta_face_ids[delta]])
+        profile_ids = np.concatenate([self.profile_ids[base], self.delta_profile_ids[delta]])
+
+        # Closest embedding per profile, then the k closest profiles
+        order = np.argsort(distances, kind="stable")
+        _, first = np.unique(profile_ids[order], return_index=True)
+        best = order[np.sort(first)][:k]
+        candidates = [
+            {"face_id": face_ids[i], "profile_id": profile_ids[i], "distance": float(distances[i])}
+            for i in best
+        ]
+        for candidate, runner_up in zip(candidates, candidates[1:] + [None]):
+            candidate["margin"] = runner_up["distance"] - candidate["distance"] if runner_up else None
+        return candidates
+
+
+class FaceIndex:
+    """
+    In-process face gallery that answers searches without a database round trip.
+
+    Loading and refreshing happen on a daemon thread; until a snapshot exists, or when
+    the last successful refresh is older than twice the refresh interval, search()
+    returns None and callers fall back to pgvector. With a `path`, the base matrix is
+    memory-mapped from files written by `manage.py build_face_index`, so workers share
+    one copy through the page cache and only keep their own delta. Every SNAPSHOT_MAX_AGE
+    a worker writes its current snapshot back to those files and prunes old tombstones.
+    """
+
+    def __init__(self, path=None, refresh_seconds=30):
+        self.path = path
+        self.refresh_seconds = refresh_seconds
+        self._gallery = None
+        self._checked_at = None
+        self._manifest_mtime = None
+        self._maintained_at = None
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def search(self, embedding, k, threshold):
+        gallery = self._current()
+        if gallery is None:
+            return None
+        return gallery.ranked_profiles(embedding, k, threshold)
+
+    def _current(self):
+        now = time.monotonic()
+        if self._checked_at is None or now - self._checked_at >= self.refresh_seconds:
+            self._start_refresh()
+        if self._checked_at is None or now - self._checked_at > 2 * self.refresh_seconds:
+            return None
+        return self._gallery
+
+    def _start_refresh(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._refresh, name="face-index-refresh", daemon=True)
+                self._thread.start()
+
+    def _refresh(self):
+        close_old_connections()
+        try:
+            gallery = self._gallery
+            if gallery is None or self._manifest_changed():
+                gallery = self._load()
+            if timezone.now() - gallery.version > DELETION_RETENTION - REFRESH_OVERLAP:
+                # Tombstones covering this snapshot may have been pruned
+                logger.warning("Face index snapshot from %s is too old to update; reloading from the database",
+                               gallery.version.isoformat())
+                gallery = Gallery.from_database()
+            self._gallery = gallery.updated(gallery.version)
+            self._checked_at = time.monotonic()
+            self._maintain()
+        except Exception:
+            logger.exception("Face index refresh failed")
+        finally:
+            close_old_connections()
+
+    def _maintain(self):
+        """
+        Writes the snapshot back to `path` once the files there are SNAPSHOT_MAX_AGE old, so
+        workers starting later (and this one, on its next refresh) load a recent copy
+        instead of a full reload, then prunes tombstones no snapshot still needs.
+        """
+        now = timezone.now()
+        if self._maintained_at is not None and now - self._maintained_at < SNAPSHOT_MAX_AGE:
+            return
+        self._maintained_at = now
+        if self.path:
+            count = save_snapshot(self._gallery, self.path, max_age=SNAPSHOT_MAX_AGE)
+            if count is not None:
+                logger.info("Wrote %d face embeddings to the face index at %s", count, self.path)
+        prune_deletions()
+
+    def _manifest_mtime_now(self):
+        try:
+            return os.stat(os.path.join(self.path, MANIFEST)).st_mtime if self.path else None
+        except FileNotFoundError:
+            return None
+
+    def _manifest_changed(self):
+        return self._manifest_mtime_now() != self._manifest_mtime
+
+    def _load(self):
+        self._manifest_mtime = self._manifest_mtime_now()
+        if self._manifest_mtime is not None:
+            return Gallery.from_files(self.path)
+        return Gallery.from_database()
+
+
+_face_index = None
+_face_index_lock = threading.Lock()
+
+
+def manifest_version(path):
+    """Version of the gallery saved at `path`, or None when there is none."""
+    try:
+        with open(os.path.join(path, MANIFEST)) as f:
+            return datetime.fromisoformat(json.load(f)["version"])
+    except FileNotFoundError:
+        return None
+
+
+def save_snapshot(gallery, path, max_age=None):
+    """
+    Saves `gallery` to `path` under a Postgres advisory lock, so workers and management
+    commands never remove each other's files. With `max_age`, nothing is written when
+    another process holds the lock or the saved gallery is younger than that. Returns the
+    number of rows written, or None.
+    """
+    with transaction.atomic(), connection.cursor() as cursor:
+        if max_age is None:
+            cursor.execute("SELECT pg_advisory_xact_lock(%s)", [SNAPSHOT_LOCK_KEY])
+        else:
+            cursor.execute("SELECT pg_try_advisory_xact_lock(%s)", [SNAPSHOT_LOCK_KEY])
+            if not cursor.fetchone()[0]:
+                return None
+            saved = manifest_version(path)
+            if saved is not None and timezone.now() - saved < max_age:
+                return None
+        return gallery.save(path)
+
+
+def prune_deletions():
+    """Drops tombstones older than DELETION_RETENTION; returns how many were removed."""
+    deleted, _ = FaceEmbeddingDeletion.objects.filter(
+        deleted_at__lt=timezone.now() - DELETION_RETENTION
+    ).delete()
+    return deleted
+
+
+def get_face_index():
+    """The process-wide FaceIndex, or None when FACE_INDEX_ENABLED is off."""
+    global _face_index
+    if not settings.FACE_INDEX_ENABLED:
+        return None
+    with _face_index_lock:
+        if _face_index is None:
+            _face_index = FaceIndex(settings.FACE_INDEX_PATH, settings.FACE_INDEX_REFRESH_SECONDS)
+    return _face_index
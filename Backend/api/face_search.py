@@ -0,0 +1,168 @@
+from contextlib import contextmanager
+from django.conf import settings
+from django.db import connection, transaction
+from pgvector import Vector
+from pgvector.django import CosineDistance
+from .models import FaceEmbedding, Profile
+
+# pgvector's defaults; larger values trade latency for recall
+DEFAULT_EF_SEARCH = 40
+DEFAULT_PROBES = 1
+# Nearest embeddings fetched per requested profile before collapsing to one per profile;
+# also the factor the pool grows by when filters leave fewer than k profiles
+CANDIDATE_POOL_FACTOR = 4
+# pgvector's upper limit for hnsw.ef_search; larger pools need an exact scan
+MAX_EF_SEARCH = 1000
+
+
+@contextmanager
+def vector_search_settings(ef_search=None, probes=None, exact=False):
+    """
+    Transaction in which vector searches use the given index settings, like SET LOCAL.
+    `exact` turns index scans off so the search is a brute-force scan (ground truth).
+    """
+    with transaction.atomic(), connection.cursor() as cursor:
+        if ef_search is not None:
+            cursor.execute("SELECT set_config('hnsw.ef_search', %s, true)", [str(int(ef_search))])
+        if probes is not None:
+            cursor.execute("SELECT set_config('ivfflat.probes', %s, true)", [str(int(probes))])
+        if exact:
+            cursor.execute("SELECT set_config('enable_indexscan', 'off', true)")
+        yield
+
+
+def nearest_faces(embedding, limit=1, ef_search=None, probes=None, exact=False):
+    """FaceEmbedding rows closest to `embedding` by cosine distance, annotated with `distance`."""
+    with vector_search_settings(ef_search, probes, exact):
+        return list(
+            FaceEmbedding.objects.select_related("profile")
+            .exclude(embedding=None)
+            .annotate(distance=CosineDistance("embedding", embedding))
+            .order_by("distance")[:limit]
+        )
+
+
+def ranked_profiles(embedding, k, threshold=None, roles=None, departments=None, ef_search=None, probes=None):
+    """
+    Up to `k` profiles whose best embedding is within `threshold` (default
+    FACE_MATCH_THRESHOLD) of `embedding`, closest first. Each candidate's `margin` is the
+    distance gap to the next one.
+
+    An index-ordered pool of k * CANDIDATE_POOL_FACTOR embeddings is collapsed to the best
+    embedding per profile, and the threshold and role/department filters are applied to the
+    pool. The index only returns ef_search rows, so a selective filter can leave fewer than
+    k profiles in the pool; it is then widened until k profiles are found, the pool reaches
+    past the threshold or runs out of embeddings. Past MAX_EF_SEARCH the search falls back
+    to an exact scan with the filters applied first.
+    """
+    threshold = settings.FACE_MATCH_THRESHOLD if threshold is None else threshold
+    filters = ""
+    if roles:
+        filters += " AND p.role = ANY(%(roles)s)"
+    if departments:
+        filters += " AND p.department = ANY(%(departments)s)"
+
+    pool = k * CANDIDATE_POOL_FACTOR
+    while True:
+        exact = pool > MAX_EF_SEARCH
+        candidates, scanned, farthest = _ranked_pool(embedding, k, threshold, filters, roles, departments,
+                                                     None if exact else pool, ef_search, probes)
+        if exact or len(candidates) >= k or scanned < pool or farthest >= threshold:
+            break
+        pool *= CANDIDATE_POOL_FACTOR
+
+    for candidate, runner_up in zip(candidates, candidates[1:] + [None]):
+        candidate["margin"] = runner_up["distance"] - candidate["distance"] if runner_up else None
+    return candidates
+
+
+def _ranked_pool(embedding, k, threshold, filters, roles, departments, pool, ef_search, probes):
+    """
+    One ranked_profiles round over the `pool` nearest embeddings, or over every embedding
+    passing the filters (exact scan) when `pool` is None. Returns (candidates, embeddings in
+    the pool, distance of the farthest one).
+    """
+    if pool is not None:
+        # The index only yields ef_search rows, so the pool must fit
+        ef_search = max(ef_search or DEFAULT_EF_SEARCH, pool)
+        prefilter = ""
+    else:
+        prefilter = " AND f.embedding <=> %(probe)s::vector < %(threshold)s" + filters
+    with vector_search_settings(ef_search, probes, exact=pool is None), connection.cursor() as cursor:
+        cursor.execute(f"""
+            WITH nearest AS (
+                SELECT f.face_id, f.profile_id, f.embedding <=> %(probe)s::vector AS distance
+                FROM face_embeddings f
+                JOIN profiles p ON p.entity_id = f.profile_id
+                WHERE f.embedding IS NOT NULL{prefilter}
+                ORDER BY f.embedding <=> %(probe)s::vector
+                LIMIT %(pool)s
+            ), best AS (
+                SELECT DISTINCT ON (n.profile_id) n.face_id, n.profile_id, n.distance
+                FROM nearest n
+                JOIN profiles p ON p.entity_id = n.profile_id
+                WHERE n.distance < %(threshold)s{filters}
+                ORDER BY n.profile_id, n.distance
+            )
+            SELECT s.scanned, s.farthest, b.face_id, b.profile_id, b.distance
+            FROM (SELECT COUNT(*) AS scanned, MAX(distance) AS farthest FROM nearest) s
+            LEFT JOIN LATERAL (SELECT * FROM best ORDER BY distance LIMIT %(k)s) b ON true
+            ORDER BY b.distance
+        """, {
+            "probe": Vector(embedding).to_text(),
+            "threshold": threshold,
+            "roles": list(roles or []),
+            "departments": list(departments or []),
+            "pool": pool,
+            "k": k,
+        })
+        rows = cursor.fetchall()
+    candidates = [
+        {"face_id": face_id, "profile_id": profile_id, "distance": distance}
+        for _, _, face_id, profile_id, distance in rows
+        if face_id is not None
+    ]
+    return candidates, rows[0][0], rows[0][1]
+
+
+def batch_nearest_faces(embeddings, limit=1, ef_search=None, probes=None):
+    """
+    The `limit` nearest faces of every embedding in one statement: the probes are unnested
+    and each runs its own index-ordered LATERAL top-k. Returns one list of match dicts
+    (face_id, profile_id, distance) per probe, in input order.
+    """
+    with vector_search_settings(ef_search, probes), connection.cursor() as cursor:
+        cursor.execute("""
+            SELECT q.i, f.face_id, f.profile_id, f.distance
+            FROM unnest(%(probes)s::vector[]) WITH ORDINALITY AS q(embedding, i)
+            CROSS JOIN LATERAL (
+                SELECT face_id, profile_id, embedding <=> q.embedding AS distance
+                FROM face_embeddings
+                WHERE embedding IS NOT NULL
+                ORDER BY embedding <=> q.embedding
+                LIMIT %(limit)s
+            ) f
+            ORDER BY q.i, f.distance
+        """, {
+            "probes": [Vector(embedding).to_text() for embedding in embeddings],
+            "limit": limit,
+        })
+        results = [[] for _ in embeddings]
+        for i, face_id, profile_id, distance in cursor.fetchall():
+            results[i - 1].append({"face_id": face_id, "profile_id": profile_id, "distance": distance})
+        return results
+
+
+def attach_profiles(results, serialize):
+    """
+    Replaces profile_id in batch results with `serialize(profile)`. Profiles are loaded in
+    one query and each is serialized once, however many probes it matches.
+    """
+    profiles = Profile.objects.in_bulk({
+        match["profile_id"] for matches in results for match in matches if match["profile_id"]
+    })
+    serialized = {entity_id: serialize(profile) for entity_id, profile in profiles.items()}
+    for matches in results:
+        for match in matches:
+            match["profile"] = serialized.get(match.pop("profile_id"))
+    return results
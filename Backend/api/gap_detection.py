@@ -0,0 +1,40 @@
+import numpy as np
+import pandas as pd
+from django.utils import timezone
+
+SECONDS_PER_DAY = 86400
+SLEEP_SECONDS = 7 * 3600  # 00:00 - 07:00 is not counted as absence
+
+
+def to_local_seconds(timestamps, tz=None):
+    """
+    Converts aware datetimes into int64 seconds on the local wall clock, so that
+    midnight in `tz` falls on a multiple of SECONDS_PER_DAY.
+    """
+    tz = tz or timezone.get_current_timezone()
+    index = pd.DatetimeIndex(timestamps)
+    if index.tz is None:
+        index = index.tz_localize("UTC")
+    local = index.tz_convert(tz).tz_localize(None)
+    return local.to_numpy(dtype="datetime64[s]").astype(np.int64)
+
+
+def _cumulative_sleep(t):
+    """Seconds of sleeping window between the epoch and t (local seconds)."""
+    days = t // SECONDS_PER_DAY
+    into_day = t - days * SECONDS_PER_DAY
+    return days * SLEEP_SECONDS + np.minimum(into_day, SLEEP_SECONDS)
+
+
+def sleep_overlap(starts, ends):
+    """
+    Closed-form overlap of each [start, end) gap with the nightly sleeping windows.
+
+    A window only counts if its midnight falls strictly inside the gap, so a gap that
+    begins at 02:00 does not get the rest of that night subtracted.
+    """
+    starts = np.asarray(starts, dtype=np.int64)
+    ends = np.asarray(ends, dtype=np.int64)
+    first_window_end = (starts // SECONDS_PER_DAY) * SECONDS_PER_DAY + SLEEP_SECONDS
+    effective_starts = np.maximum(starts, np.minimum(ends, first_window_end))
+    return _cumulative_sleep(ends) - _cumulative_sleep(effective_starts)
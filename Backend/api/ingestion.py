@@ -0,0 +1,39 @@
+from django.db import transaction
+from .activity import rebuild_activity, refresh_activity
+from .presence import rebuild_presence, refresh_presence
+from .slot_index import rebuild_location_slots, refresh_location_slots
+from .stays import rebuild_stays, refresh_stays
+
+
+def sync_derived_tables(since=None):
+    """
+    Brings the tables derived from `events` up to date after an import.
+
+    `since` is a moment taken before the import started; only events created from then on
+    are folded in. Without it everything is rebuilt, e.g. after the events were reloaded.
+    """
+    with transaction.atomic():
+        if since is None:
+            return {
+                "stays": rebuild_stays(),
+                "location_slots": rebuild_location_slots(),
+                "daily_presence": rebuild_presence(),
+                "daily_activity": rebuild_activity(),
+            }
+        return {
+            "stays": refresh_stays(since),
+            "location_slots": refresh_location_slots(since),
+            "daily_presence": refresh_presence(since),
+            "daily_activity": refresh_activity(since),
+        }
+
+
+def resync_entities(entity_ids):
+    """Rebuilds the derived rows of some entities, e.g. after their events were deleted or edited."""
+    with transaction.atomic():
+        return {
+            "stays": rebuild_stays(entity_ids),
+            "location_slots": rebuild_location_slots(entity_ids),
+            "daily_presence": rebuild_presence(entity_ids),
+            "daily_activity": rebuild_activity(entity_ids),
+        }
@@ -0,0 +1,114 @@
+import asyncio
+import json
+import select
+import threading
+import time
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection
+from .alerts import alert_to_dict
+from .models import Alert
+
+# Postgres NOTIFY channel -> message type pushed to clients (see migration 0007_live_update_triggers)
+CHANNELS = {
+    "campus_events": "activity",
+    "campus_occupancy": "occupancy",
+    "campus_alerts": "alerts",
+}
+MESSAGE_TYPES = set(CHANNELS.values())
+
+POLL_SECONDS = 5
+RECONNECT_SECONDS = 5
+SUBSCRIBER_QUEUE_SIZE = 100
+MAX_ALERTS_PER_MESSAGE = 200
+
+
+class NotificationBroadcaster:
+    """
+    Fans Postgres LISTEN/NOTIFY messages out to every connected stream of this process.
+
+    A single daemon thread holds the LISTEN connection; subscribers are asyncio queues
+    that are fed through their own event loop. Slow subscribers lose their oldest
+    messages instead of blocking everyone else.
+    """
+
+    def __init__(self):
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def subscribe(self):
+        queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        with self._lock:
+            self._subscribers.add((asyncio.get_running_loop(), queue))
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="live-updates-listener", daemon=True)
+                self._thread.start()
+        return queue
+
+    def unsubscribe(self, queue):
+        with self._lock:
+            self._subscribers = {(loop, q) for loop, q in self._subscribers if q is not queue}
+
+    def _run(self):
+        while True:
+            try:
+                self._listen()
+            except Exception as e:
+                print(f"Live updates listener error: {e}")
+                connection.close()
+                time.sleep(RECONNECT_SECONDS)
+
+    def _listen(self):
+        connection.ensure_connection()
+        raw = connection.connection
+        with raw.cursor() as cursor:
+            for channel in CHANNELS:
+                cursor.execute(f"LISTEN {channel};")
+
+        while True:
+            if select.select([raw], [], [], POLL_SECONDS) == ([], [], []):
+                continue
+            raw.poll()
+            while raw.notifies:
+                notify = raw.notifies.pop(0)
+                message = self._build_message(notify.channel, json.loads(notify.payload))
+                if message:
+                    self._publish(message)
+
+    def _build_message(self, channel, payload):
+        message_type = CHANNELS.get(channel)
+        if message_type != "alerts":
+            return {"type": message_type, **payload} if message_type else None
+
+        alerts = Alert.objects.filter(
+            id__gte=payload["min_id"],
+            id__lte=payload["max_id"]
+        ).order_by("-id")[:MAX_ALERTS_PER_MESSAGE]
+        return {
+            "type": "alerts",
+            "count": payload["count"],
+            "alerts": [alert_to_dict(alert) for alert in alerts],
+        }
+
+    def _publish(self, message):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for loop, queue in subscribers:
+            if loop.is_closed():
+                self.unsubscribe(queue)
+                continue
+            loop.call_soon_threadsafe(_offer, queue, message)
+
+
+def _offer(queue, message):
+    if queue.full():
+        queue.get_nowait()
+    queue.put_nowait(message)
+
+
+def format_event(message):
+    """Formats a message as a Server-Sent Events frame."""
+    return f"event: {message['type']}\ndata: {json.dumps(message, cls=DjangoJSONEncoder)}\n\n"
+
+
+broadcaster = NotificationBroadcaster()
@@ -0,0 +1,96 @@
+import time
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from api.face_search import DEFAULT_EF_SEARCH, DEFAULT_PROBES, nearest_faces
+from api.models import FaceEmbedding
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure recall@1 and latency of the approximate face search against an exact scan. "
+        "Queries are gallery embeddings with Gaussian noise added."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--queries", type=int, default=200, help="Number of queries (default: 200)")
+        parser.add_argument(
+            "--noise",
+            type=float,
+            default=0.02,
+            help="Standard deviation of the noise added to each query vector (default: 0.02)"
+        )
+        parser.add_argument(
+            "--ef-search",
+            type=int,
+            nargs="+",
+            default=[10, 20, DEFAULT_EF_SEARCH, 80, 160],
+            help="hnsw.ef_search values to try (default: 10 20 40 80 160)"
+        )
+        parser.add_argument(
+            "--ivfflat-lists",
+            type=int,
+            help="Also benchmark an IVFFlat index with this many lists. It is built in a transaction "
+                 "that is rolled back, and the table is locked while it runs"
+        )
+        parser.add_argument(
+            "--probes",
+            type=int,
+            nargs="+",
+            default=[DEFAULT_PROBES, 5, 10, 20],
+            help="ivfflat.probes values to try with --ivfflat-lists (default: 1 5 10 20)"
+        )
+        parser.add_argument("--seed", type=int, default=0, help="Random seed for query selection (default: 0)")
+
+    def handle(self, *args, **options):
+        gallery = FaceEmbedding.objects.exclude(embedding=None).count()
+        if not gallery:
+            raise CommandError("No face embeddings to search")
+
+        rng = np.random.default_rng(options["seed"])
+        sample = list(
+            FaceEmbedding.objects.exclude(embedding=None).order_by("?").values_list("embedding", flat=True)[:options["queries"]]
+        )
+        queries = [
+            (np.asarray(embedding, dtype=np.float32) + rng.normal(0, options["noise"], 512)).tolist()
+            for embedding in sample
+        ]
+        self.stdout.write(f"Gallery: {gallery} embeddings, {len(queries)} queries")
+
+        exact, latencies = self.run(queries, exact=True)
+        self.report("exact", exact, exact, latencies)
+
+        for ef_search in options["ef_search"]:
+            found, latencies = self.run(queries, ef_search=ef_search)
+            self.report(f"hnsw ef_search={ef_search}", found, exact, latencies)
+
+        if options["ivfflat_lists"]:
+            with transaction.atomic():
+                with connection.cursor() as cursor:
+                    # Only one vector index may exist, or the planner picks whichever it likes
+                    cursor.execute("DROP INDEX face_embeddings_hnsw_idx")
+                    cursor.execute(
+                        "CREATE INDEX face_embeddings_ivfflat_benchmark ON face_embeddings "
+                        f"USING ivfflat (embedding vector_cosine_ops) WITH (lists = {int(options['ivfflat_lists'])})"
+                    )
+                for probes in options["probes"]:
+                    found, latencies = self.run(queries, probes=probes)
+                    self.report(f"ivfflat lists={options['ivfflat_lists']} probes={probes}", found, exact, latencies)
+                transaction.set_rollback(True)
+
+    def run(self, queries, **search):
+        found = []
+        latencies = []
+        for query in queries:
+            started = time.perf_counter()
+            matches = nearest_faces(query, **search)
+            latencies.append(time.perf_counter() - started)
+            found.append(matches[0].face_id if matches else None)
+        return found, np.array(latencies)
+
+    def report(self, label, found, exact, latencies):
+        recall = np.mean([a == b for a, b in zip(found, exact)])
+        self.stdout.write(
+            f"{label:<36} recall@1={recall:.3f} "
+            f"p50={np.percentile(latencies, 50) * 1000:.2f}ms p95={np.percentile(latencies, 95) * 1000:.2f}ms"
+        )
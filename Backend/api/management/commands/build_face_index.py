@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from api.face_index import Gallery, prune_deletions, save_snapshot
+
+
+class Command(BaseCommand):
+    help = (
+        "Write the face embeddings to memory-mappable files for the in-process face index. "
+        "Running workers pick the new files up on their next refresh, and re-save them on their own "
+        "every few hours. Also prunes old deletion tombstones."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--path", help="Output directory (default: FACE_INDEX_PATH)")
+
+    def handle(self, *args, **options):
+        path = options["path"] or settings.FACE_INDEX_PATH
+        if not path:
+            raise CommandError("Pass --path or set FACE_INDEX_PATH")
+
+        count = save_snapshot(Gallery.from_database(), path)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {count} face embeddings to {path}"))
+        self.stdout.write(f"Pruned {prune_deletions()} deletion tombstones")
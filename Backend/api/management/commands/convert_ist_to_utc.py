@@ -5,6 +5,7 @@ from django.utils import timezone
 from datetime import timedelta
 import pytz
 from api import models  # Replace 'yourapp' with your actual app name
+from api.ingestion import sync_derived_tables
 
 
 class Command(BaseCommand):
@@ -75,4 +76,7 @@ class Command(BaseCommand):
         if dry_run:
             self.stdout.write(self.style.WARNING('DRY RUN COMPLETE - No changes were made'))
         else:
+            if event_count:
+                # Stays, presence and rollups are keyed on event times
+                sync_derived_tables()
             self.stdout.write(self.style.SUCCESS('All timestamps converted from IST to UTC successfully!'))
\ No newline at end of file
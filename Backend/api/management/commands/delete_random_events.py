@@ -2,6 +2,7 @@ from django.core.management.base import BaseCommand
 import datetime
 from django.db import transaction
 from django.utils.timezone import make_aware
+from api.ingestion import resync_entities
 from api.models import Event, CardSwipe, CCTVFrame, WifiLogs, Note, LabBooking, LibraryCheckout
 
 class Command(BaseCommand):
@@ -12,7 +13,7 @@ class Command(BaseCommand):
         start_time = end_time - datetime.timedelta(hours=36)
 
         with transaction.atomic():
-            random_entity_ids = (
+            random_entity_ids = list(
                 Event.objects
                 .filter(timestamp__range=(start_time, end_time))
                 .values_list('entity_id', flat=True)
@@ -37,3 +38,5 @@ class Command(BaseCommand):
 
             deleted_count, _ = events_to_delete.delete()
             print(f"Deleted {deleted_count} events for 20 random entities.")
+
+            resync_entities([entity_id for entity_id in random_entity_ids if entity_id])
@@ -0,0 +1,53 @@
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from api.alerts import INCIDENT_GAP, AlertEvaluator, reset_alerts
+
+
+class Command(BaseCommand):
+    help = "Materialize alerts for events and occupancy rows added since the last run"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rebuild",
+            action="store_true",
+            help="Drop all materialized alerts and re-evaluate the full history"
+        )
+        parser.add_argument(
+            "--merge-overcrowding",
+            action="store_true",
+            help="Report merged over-capacity intervals instead of individual samples"
+        )
+        parser.add_argument(
+            "--incident-gap-minutes",
+            type=float,
+            default=INCIDENT_GAP.total_seconds() / 60,
+            help="Merge repeated alerts of one entity and location closer than this (default: 30)"
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=0,
+            help="Keep running and re-evaluate every N seconds (default: run once)"
+        )
+
+    def handle(self, *args, **options):
+        if options["rebuild"]:
+            self.stdout.write(self.style.WARNING("Deleting materialized alerts..."))
+            reset_alerts()
+
+        evaluator = AlertEvaluator(
+            merge_overcrowding=options["merge_overcrowding"],
+            incident_gap=timedelta(minutes=options["incident_gap_minutes"])
+        )
+        while True:
+            started = time.monotonic()
+            stats = evaluator.run()
+            elapsed = time.monotonic() - started
+            summary = ", ".join(f"{alert_type}={count}" for alert_type, count in stats.items())
+            self.stdout.write(self.style.SUCCESS(f"Evaluated alerts in {elapsed:.2f}s ({summary})"))
+            self.stdout.flush()
+
+            if not options["interval"]:
+                break
+            time.sleep(options["interval"])
@@ -4,6 +4,7 @@ import pandas as pd
 from django.core.management.base import BaseCommand
 from django.db import connection
 from django.utils import timezone
+from api.ingestion import sync_derived_tables
 from api.models import Event, Profile
 from psycopg2.extras import execute_values
 
@@ -14,12 +15,19 @@ class Command(BaseCommand):
 
     def add_arguments(self, parser):
         parser.add_argument("csvfile", type=str)
+        parser.add_argument(
+            "--append",
+            action="store_true",
+            help="Keep existing events and fold the new ones into the derived tables incrementally"
+        )
 
     def handle(self, *args, **options):
         path = options["csvfile"]
-        self.stdout.write(self.style.WARNING("Deleting existing events..."))
-        Event.objects.all().delete()
-        self.stdout.write(self.style.SUCCESS("Existing events deleted."))
+        started = timezone.now()
+        if not options["append"]:
+            self.stdout.write(self.style.WARNING("Deleting existing events..."))
+            Event.objects.all().delete()
+            self.stdout.write(self.style.SUCCESS("Existing events deleted."))
 
         df = pd.read_csv(path)
         df["timestamp"] = pd.to_datetime(df["timestamp"], errors="coerce")
@@ -78,3 +86,9 @@ class Command(BaseCommand):
                 self.stdout.flush()
 
         self.stdout.write(self.style.SUCCESS(f"Done. Inserted {inserted} events total."))
+
+        # Appended events are folded in; a full reload rebuilds the derived tables
+        self.stdout.write("Updating derived tables...")
+        stats = sync_derived_tables(since=started if options["append"] else None)
+        summary = ", ".join(f"{table}={count}" for table, count in stats.items())
+        self.stdout.write(self.style.SUCCESS(f"Derived tables updated ({summary})."))
@@ -1,10 +1,12 @@
 import ast
 import pandas as pd
 from tqdm import tqdm
+from django.conf import settings
 from django.core.management.base import BaseCommand
 from django.db import connection
 from psycopg2.extras import execute_values
 
+from api.face_index import Gallery, save_snapshot
 from api.models import Profile
 
 
@@ -72,3 +74,8 @@ class Command(BaseCommand):
 
         self.stdout.write(self.style.SUCCESS(f"✅ Successfully imported {total} embeddings!"))
         self.stdout.write(self.style.SUCCESS(f"🔗 {linked} embeddings linked to profiles."))
+
+        if settings.FACE_INDEX_PATH:
+            # Workers would otherwise each reload the whole gallery from the database
+            count = save_snapshot(Gallery.from_database(), settings.FACE_INDEX_PATH)
+            self.stdout.write(self.style.SUCCESS(f"Wrote {count} embeddings to the face index at {settings.FACE_INDEX_PATH}"))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from api.ingestion import resync_entities, sync_derived_tables
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the tables derived from events from scratch: stays, location slots, "
+        "daily presence bitmaps, daily activity rollups and profile last_seen"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--entity",
+            action="append",
+            dest="entities",
+            help="Only rebuild this entity (repeatable)"
+        )
+
+    def handle(self, *args, **options):
+        if options["entities"]:
+            stats = resync_entities(options["entities"])
+        else:
+            stats = sync_derived_tables()
+        summary = ", ".join(f"{table}={count}" for table, count in stats.items())
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt derived tables ({summary})"))
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.7 on 2026-10-17 03:34
+
+import django.core.serializers.json
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_occupancydata'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AlertWatermark',
+            fields=[
+                ('name', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('events_created_at', models.DateTimeField(blank=True, null=True)),
+                ('occupancy_id', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'alert_watermarks',
+            },
+        ),
+        migrations.CreateModel(
+            name='Alert',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('fingerprint', models.CharField(max_length=255, unique=True)),
+                ('alert_type', models.CharField(choices=[('missing_person', 'Missing Person'), ('overcrowding', 'Overcrowding'), ('access_violation', 'Access Violation'), ('after_hours', 'After Hours Access')], max_length=32)),
+                ('severity', models.PositiveSmallIntegerField()),
+                ('location', models.CharField(blank=True, max_length=120, null=True)),
+                ('occurred_at', models.DateTimeField()),
+                ('message', models.TextField()),
+                ('details', models.JSONField(default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('recommendation', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('entity', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='alerts', to='api.profile')),
+            ],
+            options={
+                'db_table': 'alerts',
+                'indexes': [models.Index(fields=['alert_type', 'occurred_at'], name='alerts_alert_t_b4366f_idx'), models.Index(fields=['occurred_at'], name='alerts_occurre_73f3e4_idx'), models.Index(fields=['entity', 'alert_type', 'occurred_at'], name='alerts_entity__1ced12_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.7 on 2026-10-17 03:35
+
+from django.db import migrations, models
+
+ACCESS_RULES = {
+    'Faculty Office': ['faculty', 'staff'],
+    'LAB_305': ['faculty', 'student'],
+    'Hostel': ['student'],
+    'Admin Lobby': ['faculty', 'staff'],
+    'Main Building': ['faculty', 'staff'],
+    'Library': ['faculty', 'staff', 'student']
+}
+
+
+def seed_access_rules(apps, schema_editor):
+    AccessRule = apps.get_model('api', 'AccessRule')
+    AccessRule.objects.bulk_create([
+        AccessRule(location=location, role=role)
+        for location, roles in ACCESS_RULES.items()
+        for role in roles
+    ], ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_alerts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AccessRule',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('location', models.CharField(max_length=120)),
+                ('role', models.CharField(choices=[('student', 'Student'), ('faculty', 'Faculty'), ('staff', 'Staff')], max_length=21)),
+            ],
+            options={
+                'db_table': 'access_rules',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['location', 'timestamp'], name='events_locatio_5bdac4_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='accessrule',
+            constraint=models.UniqueConstraint(fields=('location', 'role'), name='unique_access_rule'),
+        ),
+        migrations.RunPython(seed_access_rules, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.7 on 2026-10-17 03:35
+
+import api.models
+from django.db import migrations, models
+
+AFTER_HOURS_WINDOWS = {
+    'Main Building': (22, 7),
+    'Library': (22, 7),
+}
+
+
+def seed_after_hours_windows(apps, schema_editor):
+    AfterHoursWindow = apps.get_model('api', 'AfterHoursWindow')
+    AfterHoursWindow.objects.bulk_create([
+        AfterHoursWindow(location=location, start_hour=start_hour, end_hour=end_hour)
+        for location, (start_hour, end_hour) in AFTER_HOURS_WINDOWS.items()
+    ], ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_access_rules'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AfterHoursWindow',
+            fields=[
+                ('location', models.CharField(max_length=120, primary_key=True, serialize=False)),
+                ('start_hour', models.PositiveSmallIntegerField()),
+                ('end_hour', models.PositiveSmallIntegerField()),
+            ],
+            options={
+                'db_table': 'after_hours_windows',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(models.F('location'), api.models.LocalHour('timestamp', tz='Asia/Kolkata'), name='events_location_local_hour_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='afterhourswindow',
+            constraint=models.CheckConstraint(condition=models.Q(('start_hour__lt', 24), ('end_hour__lte', 24)), name='valid_after_hours_window'),
+        ),
+        migrations.RunPython(seed_after_hours_windows, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.7 on 2026-10-17 03:37
+
+from django.db import migrations, models
+
+LOCATION_MAX_CAPACITY = {
+    'Admin Lobby': 710,
+    'Auditorium': 1360,
+    'Hostel': 5000,
+    'LAB_102': 15,
+    'LAB': 30,
+    'Library': 2150,
+    'Seminar Room': 1800,
+    'WORKSHOP': 20,
+    'LAB_305': 30,
+    'Gym': 1012,
+    'LAB_101': 40,
+    'Cafeteria': 1360,
+    'LAB_A2': 12,
+    'LAB_A1': 20,
+    'Main Building': 30,
+    'Faculty Office': 650
+}
+
+
+def seed_location_capacities(apps, schema_editor):
+    LocationCapacity = apps.get_model('api', 'LocationCapacity')
+    LocationCapacity.objects.bulk_create([
+        LocationCapacity(location_id=location_id, max_capacity=max_capacity)
+        for location_id, max_capacity in LOCATION_MAX_CAPACITY.items()
+    ], ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_after_hours_windows'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LocationCapacity',
+            fields=[
+                ('location_id', models.CharField(max_length=108, primary_key=True, serialize=False)),
+                ('max_capacity', models.PositiveIntegerField()),
+            ],
+            options={
+                'db_table': 'location_capacities',
+            },
+        ),
+        migrations.RunPython(seed_location_capacities, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,97 @@
+from django.db import migrations
+
+CREATE_TRIGGERS = """
+CREATE OR REPLACE FUNCTION notify_events_inserted() RETURNS trigger AS $$
+DECLARE
+    payload json;
+BEGIN
+    SELECT json_build_object(
+        'events', SUM(n),
+        'latest', MAX(latest),
+        'locations', json_object_agg(location, n) FILTER (WHERE location IS NOT NULL)
+    )
+    INTO payload
+    FROM (
+        SELECT location, COUNT(*) AS n, MAX(timestamp) AS latest
+        FROM new_rows
+        GROUP BY location
+    ) per_location;
+
+    IF payload->>'events' IS NOT NULL THEN
+        PERFORM pg_notify('campus_events', payload::text);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER events_notify_insert
+    AFTER INSERT ON events
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_events_inserted();
+
+CREATE OR REPLACE FUNCTION notify_occupancy_inserted() RETURNS trigger AS $$
+DECLARE
+    payload json;
+BEGIN
+    SELECT json_build_object(
+        'locations', json_object_agg(location_id, json_build_object('start_time', start_time, 'count', count))
+    )
+    INTO payload
+    FROM (
+        SELECT DISTINCT ON (location_id) location_id, start_time, count
+        FROM new_rows
+        ORDER BY location_id, start_time DESC
+    ) latest;
+
+    IF payload->>'locations' IS NOT NULL THEN
+        PERFORM pg_notify('campus_occupancy', payload::text);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER occupancy_notify_insert
+    AFTER INSERT ON occupancy_data
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_occupancy_inserted();
+
+CREATE OR REPLACE FUNCTION notify_alerts_inserted() RETURNS trigger AS $$
+DECLARE
+    payload json;
+BEGIN
+    SELECT json_build_object('count', COUNT(*), 'min_id', MIN(id), 'max_id', MAX(id))
+    INTO payload
+    FROM new_rows;
+
+    IF (payload->>'count')::int > 0 THEN
+        PERFORM pg_notify('campus_alerts', payload::text);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER alerts_notify_insert
+    AFTER INSERT ON alerts
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_alerts_inserted();
+"""
+
+DROP_TRIGGERS = """
+DROP TRIGGER IF EXISTS alerts_notify_insert ON alerts;
+DROP FUNCTION IF EXISTS notify_alerts_inserted();
+DROP TRIGGER IF EXISTS occupancy_notify_insert ON occupancy_data;
+DROP FUNCTION IF EXISTS notify_occupancy_inserted();
+DROP TRIGGER IF EXISTS events_notify_insert ON events;
+DROP FUNCTION IF EXISTS notify_events_inserted();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_location_capacities'),
+    ]
+
+    operations = [
+        migrations.RunSQL(CREATE_TRIGGERS, DROP_TRIGGERS),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.7 on 2026-10-17 03:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_live_update_triggers'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='alert',
+            name='alerts_alert_t_b4366f_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='alert',
+            name='alerts_occurre_73f3e4_idx',
+        ),
+        migrations.AddIndex(
+            model_name='alert',
+            index=models.Index(fields=['alert_type', 'occurred_at', 'id'], name='alerts_alert_t_e815d1_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='alert',
+            index=models.Index(fields=['occurred_at', 'id'], name='alerts_occurre_7429d0_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='alert',
+            index=models.Index(fields=['severity', 'occurred_at', 'id'], name='alerts_severit_b4ea64_idx'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.7 on 2026-10-17 03:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_alert_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='alert',
+            name='last_seen_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='alert',
+            name='occurrences',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.RunSQL(
+            "UPDATE alerts SET last_seen_at = occurred_at WHERE last_seen_at IS NULL;",
+            migrations.RunSQL.noop
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.7 on 2026-10-17 03:46
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_alert_incidents'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimelineSummary',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('start_time', models.DateTimeField()),
+                ('end_time', models.DateTimeField()),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('ready', 'Ready'), ('failed', 'Failed')], default='pending', max_length=16)),
+                ('summary', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('entity', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline_summaries', to='api.profile')),
+            ],
+            options={
+                'db_table': 'timeline_summaries',
+                'constraints': [models.UniqueConstraint(fields=('entity', 'start_time', 'end_time'), name='unique_timeline_summary')],
+            },
+        ),
+    ]
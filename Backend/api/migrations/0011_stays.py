@@ -0,0 +1,30 @@
+# Generated by Django 5.2.7 on 2026-10-17 03:48
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_timeline_summaries'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Stay',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('location', models.CharField(max_length=120)),
+                ('start_time', models.DateTimeField()),
+                ('end_time', models.DateTimeField()),
+                ('event_count', models.PositiveIntegerField()),
+                ('mean_confidence', models.FloatField()),
+                ('entity', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stays', to='api.profile')),
+            ],
+            options={
+                'db_table': 'stays',
+                'indexes': [models.Index(fields=['entity', 'start_time'], name='stays_entity__182fe4_idx')],
+            },
+        ),
+    ]
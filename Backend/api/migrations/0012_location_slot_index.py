@@ -0,0 +1,38 @@
+# Generated by Django 5.2.7 on 2026-10-17 03:51
+
+import django.contrib.postgres.fields
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_stays'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EntityOrdinal',
+            fields=[
+                ('ordinal', models.PositiveIntegerField(primary_key=True, serialize=False)),
+                ('entity', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='ordinal', to='api.profile')),
+            ],
+            options={
+                'db_table': 'entity_ordinals',
+            },
+        ),
+        migrations.CreateModel(
+            name='LocationSlot',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('location', models.CharField(max_length=120)),
+                ('slot_start', models.DateTimeField()),
+                ('members', django.contrib.postgres.fields.ArrayField(base_field=models.IntegerField(), default=list, size=None)),
+            ],
+            options={
+                'db_table': 'location_slots',
+                'constraints': [models.UniqueConstraint(fields=('location', 'slot_start'), name='unique_location_slot')],
+            },
+        ),
+    ]
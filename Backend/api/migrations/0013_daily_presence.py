@@ -0,0 +1,29 @@
+# Generated by Django 5.2.7 on 2026-10-17 03:53
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_location_slot_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyPresence',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('day', models.DateField()),
+                ('slots_lo', models.BigIntegerField(default=0)),
+                ('slots_hi', models.BigIntegerField(default=0)),
+                ('entity', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_presence', to='api.profile')),
+            ],
+            options={
+                'db_table': 'daily_presence',
+                'indexes': [models.Index(fields=['day'], name='daily_prese_day_12a29b_idx')],
+                'constraints': [models.UniqueConstraint(fields=('entity', 'day'), name='unique_daily_presence')],
+            },
+        ),
+    ]
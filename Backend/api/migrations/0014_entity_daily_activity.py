@@ -0,0 +1,38 @@
+# Generated by Django 5.2.7 on 2026-10-17 03:57
+
+import django.contrib.postgres.fields
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_daily_presence'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='last_seen',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='EntityDailyActivity',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('day', models.DateField()),
+                ('first_seen', models.DateTimeField()),
+                ('last_seen', models.DateTimeField()),
+                ('event_count', models.PositiveIntegerField()),
+                ('event_counts', models.JSONField(default=dict)),
+                ('locations', django.contrib.postgres.fields.ArrayField(base_field=models.CharField(max_length=120), default=list, size=None)),
+                ('entity', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_activity', to='api.profile')),
+            ],
+            options={
+                'db_table': 'entity_daily_activity',
+                'indexes': [models.Index(fields=['day'], name='entity_dail_day_22288b_idx')],
+                'constraints': [models.UniqueConstraint(fields=('entity', 'day'), name='unique_entity_daily_activity')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-17 03:59
+
+import pgvector.django.indexes
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_entity_daily_activity'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='faceembedding',
+            index=pgvector.django.indexes.HnswIndex(ef_construction=64, fields=['embedding'], m=16, name='face_embeddings_hnsw_idx', opclasses=['vector_cosine_ops']),
+        ),
+    ]
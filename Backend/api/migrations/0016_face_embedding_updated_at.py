@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-17 04:03
+
+import django.db.models.functions.datetime
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0015_face_embedding_hnsw'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='faceembedding',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_default=django.db.models.functions.datetime.Now()),
+        ),
+        migrations.AddIndex(
+            model_name='faceembedding',
+            index=models.Index(fields=['updated_at'], name='face_embedd_updated_2a398c_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.7 on 2026-10-17 04:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0016_face_embedding_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['created_at'], name='events_created_9e2206_idx'),
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.2.7 on 2026-10-17 04:17
+
+import django.db.models.functions.datetime
+from django.db import migrations, models
+
+# Deletes leave tombstones and every update moves updated_at, including raw SQL and the
+# SET NULL issued when a profile is deleted, so the face index can refresh incrementally
+CREATE_TRIGGERS = """
+CREATE OR REPLACE FUNCTION record_face_embedding_deletions() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO face_embedding_deletions (face_id, deleted_at)
+    SELECT face_id, now() FROM old_rows;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER face_embeddings_record_delete
+    AFTER DELETE ON face_embeddings
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION record_face_embedding_deletions();
+
+CREATE OR REPLACE FUNCTION touch_face_embedding() RETURNS trigger AS $$
+BEGIN
+    NEW.updated_at := now();
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER face_embeddings_touch_update
+    BEFORE UPDATE ON face_embeddings
+    FOR EACH ROW EXECUTE FUNCTION touch_face_embedding();
+"""
+
+DROP_TRIGGERS = """
+DROP TRIGGER IF EXISTS face_embeddings_touch_update ON face_embeddings;
+DROP FUNCTION IF EXISTS touch_face_embedding();
+DROP TRIGGER IF EXISTS face_embeddings_record_delete ON face_embeddings;
+DROP FUNCTION IF EXISTS record_face_embedding_deletions();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0017_event_created_at_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FaceEmbeddingDeletion',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('face_id', models.CharField(max_length=64)),
+                ('deleted_at', models.DateTimeField(db_default=django.db.models.functions.datetime.Now())),
+            ],
+            options={
+                'db_table': 'face_embedding_deletions',
+                'indexes': [models.Index(fields=['deleted_at'], name='face_embedd_deleted_0374dd_idx')],
+            },
+        ),
+        migrations.RunSQL(CREATE_TRIGGERS, DROP_TRIGGERS),
+    ]
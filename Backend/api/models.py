@@ -1,7 +1,12 @@
+import re
 import uuid
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from django.contrib.postgres.fields import ArrayField
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
-from django.db.models import Q, Index
-from pgvector.django import VectorField
+from django.db.models import F, Func, Q, Index
+from django.db.models.functions import Now
+from pgvector.django import HnswIndex, VectorField
 
 ROLE_CHOICES = [
     ("student", "Student"),
@@ -18,6 +23,46 @@ EVENT_TYPE_CHOICES = [
     ("text_notes", "TextNotes")
 ]
 
+ALERT_TYPE_CHOICES = [
+    ("missing_person", "Missing Person"),
+    ("overcrowding", "Overcrowding"),
+    ("access_violation", "Access Violation"),
+    ("after_hours", "After Hours Access")
+]
+
+SUMMARY_STATUS_CHOICES = [
+    ("pending", "Pending"),
+    ("ready", "Ready"),
+    ("failed", "Failed")
+]
+
+# Zone of events_location_local_hour_idx. Pinned rather than read from CAMPUS_TIME_ZONE so the
+# migrated index does not depend on the environment; queries only use it when the two match.
+# Changing it needs a new migration, which rebuilds the index
+LOCAL_HOUR_INDEX_TIME_ZONE = "Asia/Kolkata"
+
+_ZONE_NAME = re.compile(r"[A-Za-z0-9_+\-]+(/[A-Za-z0-9_+\-]+)*")
+
+
+class LocalHour(Func):
+    """
+    Hour of day of a timestamptz on the wall clock of `tz`. Both AT TIME ZONE with a
+    constant zone and EXTRACT are immutable, so this can back an expression index.
+    The zone is part of the SQL text, so only valid IANA zone names are accepted.
+    """
+    template = "EXTRACT(HOUR FROM %(expressions)s AT TIME ZONE '%(tz)s')"
+    output_field = models.IntegerField()
+
+    def __init__(self, expression, tz, **extra):
+        try:
+            if not _ZONE_NAME.fullmatch(tz):
+                raise ValueError
+            ZoneInfo(tz)
+        except (TypeError, ValueError, ZoneInfoNotFoundError):
+            raise ValueError(f"Invalid time zone name: {tz!r}") from None
+        super().__init__(expression, tz=tz, **extra)
+
+
 class Profile(models.Model):
     entity_id = models.CharField(primary_key=True, max_length=32)
     name = models.CharField(max_length=108)
@@ -32,6 +77,8 @@ class Profile(models.Model):
     face_id = models.CharField(max_length=108, unique=True, null=True, blank=True)
     device_hash = models.CharField(max_length=108, unique=True, null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Latest event timestamp, maintained with the derived tables
+    last_seen = models.DateTimeField(null=True, blank=True)
 
     class Meta:
         db_table = "profiles"
@@ -58,7 +105,11 @@ class Event(models.Model):
         indexes = [
             models.Index(fields=["entity", "timestamp"]),
             models.Index(fields=["event_type", "timestamp"]),
-            models.Index(fields=["timestamp"])
+            models.Index(fields=["timestamp"]),
+            models.Index(fields=["location", "timestamp"]),
+            # Incremental consumers (alert watermark, derived tables) select rows by insertion time
+            models.Index(fields=["created_at"]),
+            models.Index(F("location"), LocalHour("timestamp", tz=LOCAL_HOUR_INDEX_TIME_ZONE), name="events_location_local_hour_idx")
         ]
 
     def __str__(self):
@@ -172,21 +223,139 @@ class LibraryCheckout(models.Model):
     def __str__(self):
         return f"library:{self.checkout_id} ({self.book_id})"
 
+class Stay(models.Model):
+    id = models.BigAutoField(primary_key=True)
+    entity = models.ForeignKey(Profile, on_delete=models.CASCADE, related_name="stays")
+    location = models.CharField(max_length=120)
+    start_time = models.DateTimeField()
+    end_time = models.DateTimeField()
+    event_count = models.PositiveIntegerField()
+    mean_confidence = models.FloatField()
+
+    class Meta:
+        db_table = "stays"
+        indexes = [
+            models.Index(fields=["entity", "start_time"]),
+        ]
+
+    def __str__(self):
+        return f"{self.entity_id} @ {self.location}: {self.start_time.isoformat()} - {self.end_time.isoformat()}"
+
+
+class EntityOrdinal(models.Model):
+    ordinal = models.PositiveIntegerField(primary_key=True)
+    entity = models.OneToOneField(Profile, on_delete=models.CASCADE, related_name="ordinal")
+
+    class Meta:
+        db_table = "entity_ordinals"
+
+    def __str__(self):
+        return f"{self.ordinal}: {self.entity_id}"
+
+
+class LocationSlot(models.Model):
+    id = models.BigAutoField(primary_key=True)
+    location = models.CharField(max_length=120)
+    slot_start = models.DateTimeField()
+    members = ArrayField(models.IntegerField(), default=list)
+
+    class Meta:
+        db_table = "location_slots"
+        constraints = [
+            models.UniqueConstraint(fields=["location", "slot_start"], name="unique_location_slot")
+        ]
+
+    def __str__(self):
+        return f"{self.location} @ {self.slot_start.isoformat()}: {len(self.members)}"
+
+
+class DailyPresence(models.Model):
+    id = models.BigAutoField(primary_key=True)
+    entity = models.ForeignKey(Profile, on_delete=models.CASCADE, related_name="daily_presence")
+    day = models.DateField()
+    # 96 fifteen-minute slots of the campus day: bits 0-63 in slots_lo, 64-95 in slots_hi
+    slots_lo = models.BigIntegerField(default=0)
+    slots_hi = models.BigIntegerField(default=0)
+
+    class Meta:
+        db_table = "daily_presence"
+        constraints = [
+            models.UniqueConstraint(fields=["entity", "day"], name="unique_daily_presence")
+        ]
+        indexes = [
+            models.Index(fields=["day"]),
+        ]
+
+    def __str__(self):
+        return f"{self.entity_id} {self.day}"
+
+
+class EntityDailyActivity(models.Model):
+    id = models.BigAutoField(primary_key=True)
+    entity = models.ForeignKey(Profile, on_delete=models.CASCADE, related_name="daily_activity")
+    day = models.DateField()
+    first_seen = models.DateTimeField()
+    last_seen = models.DateTimeField()
+    event_count = models.PositiveIntegerField()
+    # Events per event_type, types without events left out
+    event_counts = models.JSONField(default=dict)
+    locations = ArrayField(models.CharField(max_length=120), default=list)
+
+    class Meta:
+        db_table = "entity_daily_activity"
+        constraints = [
+            models.UniqueConstraint(fields=["entity", "day"], name="unique_entity_daily_activity")
+        ]
+        indexes = [
+            models.Index(fields=["day"]),
+        ]
+
+    def __str__(self):
+        return f"{self.entity_id} {self.day}: {self.event_count} events"
+
+
 class FaceEmbedding(models.Model):
     face_id = models.CharField(primary_key=True, max_length=64)
     profile = models.ForeignKey(Profile, null=True, blank=True, on_delete=models.SET_NULL, related_name="face_embeddings")
     embedding = VectorField(dimensions=512, null=True, blank=True)
     embedding_model = models.CharField(max_length=128, null=True, blank=True, default="InceptionResnetV1")
+    # Set by the database too, so raw imports are picked up by the in-process face index
+    updated_at = models.DateTimeField(auto_now=True, db_default=Now())
 
     class Meta:
         db_table = "face_embeddings"
         indexes = [
             Index(fields=["profile"]),
+            Index(fields=["updated_at"]),
+            # Approximate nearest-neighbour search on cosine distance; recall is tuned per query with hnsw.ef_search
+            HnswIndex(
+                name="face_embeddings_hnsw_idx",
+                fields=["embedding"],
+                m=16,
+                ef_construction=64,
+                opclasses=["vector_cosine_ops"],
+            ),
         ]
 
     def __str__(self):
         return f"face_embedding:{self.face_id} ({self.profile})"
 
+
+class FaceEmbeddingDeletion(models.Model):
+    """Tombstone of a deleted face_embeddings row, written by a database trigger."""
+    id = models.BigAutoField(primary_key=True)
+    face_id = models.CharField(max_length=64)
+    deleted_at = models.DateTimeField(db_default=Now())
+
+    class Meta:
+        db_table = "face_embedding_deletions"
+        indexes = [
+            Index(fields=["deleted_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.face_id} deleted {self.deleted_at.isoformat()}"
+
 class OccupancyData(models.Model):
     id = models.BigAutoField(primary_key=True)
     location_id = models.CharField(max_length=108, db_index=True)
@@ -202,4 +371,109 @@ class OccupancyData(models.Model):
         ordering = ["location_id", "start_time"]
 
     def __str__(self):
-        return f"{self.location_id} @ {self.start_time}: {self.count}"
\ No newline at end of file
+        return f"{self.location_id} @ {self.start_time}: {self.count}"
+
+class Alert(models.Model):
+    id = models.BigAutoField(primary_key=True)
+    fingerprint = models.CharField(max_length=255, unique=True)
+    alert_type = models.CharField(max_length=32, choices=ALERT_TYPE_CHOICES)
+    severity = models.PositiveSmallIntegerField()
+    entity = models.ForeignKey(Profile, null=True, blank=True, on_delete=models.CASCADE, related_name="alerts")
+    location = models.CharField(max_length=120, null=True, blank=True)
+    occurred_at = models.DateTimeField()
+    last_seen_at = models.DateTimeField(null=True, blank=True)
+    occurrences = models.PositiveIntegerField(default=1)
+    message = models.TextField()
+    details = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    recommendation = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "alerts"
+        indexes = [
+            models.Index(fields=["alert_type", "occurred_at", "id"]),
+            models.Index(fields=["occurred_at", "id"]),
+            # Only narrows selective min_severity filters; a range on severity cannot yield
+            # (occurred_at, id) order, so paged reads still walk the index above
+            models.Index(fields=["severity", "occurred_at", "id"]),
+            models.Index(fields=["entity", "alert_type", "occurred_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.alert_type} @ {self.occurred_at.isoformat()}"
+
+
+class AccessRule(models.Model):
+    id = models.AutoField(primary_key=True)
+    location = models.CharField(max_length=120)
+    role = models.CharField(choices=ROLE_CHOICES, max_length=21)
+
+    class Meta:
+        db_table = "access_rules"
+        constraints = [
+            models.UniqueConstraint(fields=["location", "role"], name="unique_access_rule")
+        ]
+
+    def __str__(self):
+        return f"{self.role} allowed in {self.location}"
+
+
+class AfterHoursWindow(models.Model):
+    """Campus-local hours [start_hour, end_hour) during which a location is closed; may wrap midnight."""
+    location = models.CharField(primary_key=True, max_length=120)
+    start_hour = models.PositiveSmallIntegerField()
+    end_hour = models.PositiveSmallIntegerField()
+
+    class Meta:
+        db_table = "after_hours_windows"
+        constraints = [
+            models.CheckConstraint(check=Q(start_hour__lt=24) & Q(end_hour__lte=24), name="valid_after_hours_window")
+        ]
+
+    def __str__(self):
+        return f"{self.location}: closed {self.start_hour:02d}:00-{self.end_hour:02d}:00"
+
+
+class LocationCapacity(models.Model):
+    location_id = models.CharField(primary_key=True, max_length=108)
+    max_capacity = models.PositiveIntegerField()
+
+    class Meta:
+        db_table = "location_capacities"
+
+    def __str__(self):
+        return f"{self.location_id}: {self.max_capacity}"
+
+
+class AlertWatermark(models.Model):
+    name = models.CharField(primary_key=True, max_length=64)
+    events_created_at = models.DateTimeField(null=True, blank=True)
+    occupancy_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "alert_watermarks"
+
+    def __str__(self):
+        return f"{self.name}: events<={self.events_created_at}, occupancy<={self.occupancy_id}"
+
+
+class TimelineSummary(models.Model):
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    entity = models.ForeignKey(Profile, on_delete=models.CASCADE, related_name="timeline_summaries")
+    start_time = models.DateTimeField()
+    end_time = models.DateTimeField()
+    status = models.CharField(max_length=16, choices=SUMMARY_STATUS_CHOICES, default="pending")
+    summary = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "timeline_summaries"
+        constraints = [
+            models.UniqueConstraint(fields=["entity", "start_time", "end_time"], name="unique_timeline_summary")
+        ]
+
+    def __str__(self):
+        return f"{self.entity_id} {self.start_time.date()}: {self.status}"
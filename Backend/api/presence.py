@@ -0,0 +1,217 @@
+from datetime import datetime, time, timedelta
+from zoneinfo import ZoneInfo
+import numpy as np
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+from . import gap_detection
+from .models import DailyPresence
+
+SLOT_SECONDS = 15 * 60
+SLOTS_PER_DAY = 96
+# Slots of the nightly sleeping window, which never count as absence
+SLEEP_SLOTS = gap_detection.SLEEP_SECONDS // SLOT_SECONDS
+
+# Slot bits of every (entity, campus day) an event falls into; slots 0-63 go to slots_lo,
+# 64-95 to slots_hi. The last slot absorbs the extra hour of a DST fall-back day.
+_PRESENCE_SQL = """
+    INSERT INTO daily_presence (entity_id, day, slots_lo, slots_hi)
+    SELECT entity_id, day,
+           bit_or(CASE WHEN slot < 64 THEN 1::bigint << slot ELSE 0 END),
+           bit_or(CASE WHEN slot >= 64 THEN 1::bigint << (slot - 64) ELSE 0 END)
+    FROM (
+        SELECT entity_id, local::date AS day,
+               LEAST(95, (EXTRACT(HOUR FROM local) * 4 + FLOOR(EXTRACT(MINUTE FROM local) / 15))::int) AS slot
+        FROM (
+            SELECT entity_id, timestamp AT TIME ZONE %(tz)s AS local
+            FROM events
+            WHERE entity_id IS NOT NULL {condition}
+        ) localized
+    ) slotted
+    GROUP BY entity_id, day
+    ON CONFLICT (entity_id, day) DO UPDATE
+    SET slots_lo = daily_presence.slots_lo | EXCLUDED.slots_lo,
+        slots_hi = daily_presence.slots_hi | EXCLUDED.slots_hi
+"""
+
+
+def refresh_presence(since=None):
+    """
+    ORs the slots of events created at or after `since` (or of all events) into the stored
+    bitmaps. Setting bits is idempotent, so overlapping refreshes are harmless.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            _PRESENCE_SQL.format(condition="AND created_at >= %(since)s" if since else ""),
+            {"since": since, "tz": settings.CAMPUS_TIME_ZONE}
+        )
+        return cursor.rowcount
+
+
+def rebuild_presence(entity_ids=None):
+    """Recomputes the bitmaps of the given entities, or of everyone, from the raw events."""
+    params = {"tz": settings.CAMPUS_TIME_ZONE, "entity_ids": list(entity_ids) if entity_ids is not None else None}
+    with connection.cursor() as cursor:
+        if entity_ids is None:
+            cursor.execute("TRUNCATE daily_presence")
+            condition = ""
+        else:
+            cursor.execute("DELETE FROM daily_presence WHERE entity_id = ANY(%(entity_ids)s)", params)
+            condition = "AND entity_id = ANY(%(entity_ids)s)"
+        cursor.execute(_PRESENCE_SQL.format(condition=condition), params)
+        return cursor.rowcount
+
+
+def unpack_slots(slots_lo, slots_hi):
+    """(n,) signed bigint pairs -> (n, 96) bool matrix, column k being slot k of the day."""
+    words = np.stack([
+        np.asarray(slots_lo, dtype=np.int64),
+        np.asarray(slots_hi, dtype=np.int64)
+    ], axis=1).astype("<i8").view(np.uint8)
+    return np.unpackbits(words, axis=1, bitorder="little")[:, :SLOTS_PER_DAY].astype(bool)
+
+
+def load_presence(entity_ids, first_day, last_day):
+    """
+    Presence of `entity_ids` over the campus days first_day..last_day as a bool matrix with one
+    row per entity (in the given order) and one column per slot. Days without a row are empty.
+    """
+    entity_ids = list(entity_ids)
+    days = (last_day - first_day).days + 1
+    matrix = np.zeros((len(entity_ids), days, SLOTS_PER_DAY), dtype=bool)
+    rows = list(DailyPresence.objects.filter(
+        entity_id__in=entity_ids, day__gte=first_day, day__lte=last_day
+    ).values_list("entity_id", "day", "slots_lo", "slots_hi"))
+    if rows:
+        row_of = {entity_id: i for i, entity_id in enumerate(entity_ids)}
+        entities, row_days, slots_lo, slots_hi = zip(*rows)
+        matrix[
+            [row_of[entity_id] for entity_id in entities],
+            [(day - first_day).days for day in row_days]
+        ] = unpack_slots(slots_lo, slots_hi)
+    return matrix.reshape(len(entity_ids), days * SLOTS_PER_DAY)
+
+
+def slot_position(moment, first_day, tz=None):
+    """Column of `moment` in a matrix returned by load_presence starting at first_day."""
+    local = timezone.localtime(moment, tz or ZoneInfo(settings.CAMPUS_TIME_ZONE))
+    slot = min(SLOTS_PER_DAY - 1, (local.hour * 60 + local.minute) // 15)
+    return (local.date() - first_day).days * SLOTS_PER_DAY + slot
+
+
+def slot_start(position, first_day, tz=None):
+    """Aware start time of a matrix column; inverse of slot_position."""
+    day, slot = divmod(int(position), SLOTS_PER_DAY)
+    local = datetime.combine(first_day + timedelta(days=day), time()) + timedelta(seconds=slot * SLOT_SECONDS)
+    return timezone.make_aware(local, tz or ZoneInfo(settings.CAMPUS_TIME_ZONE))
+
+
+def awake_columns(width):
+    """Columns outside the nightly sleeping window."""
+    return np.arange(width) % SLOTS_PER_DAY >= SLEEP_SLOTS
+
+
+def absence_runs(matrix, awake=None):
+    """
+    Every run of empty slots that lies between two present slots of the same entity.
+
+    Returns (entity_rows, starts, ends, awake_slots): run k covers columns
+    starts[k]..ends[k] - 1 of row entity_rows[k], and awake_slots[k] of them count as
+    absence. As in gap_detection.sleep_overlap, a sleeping window only counts as sleep if
+    its midnight falls inside the run.
+    """
+    rows, columns = np.nonzero(matrix)
+    inner = np.flatnonzero((rows[1:] == rows[:-1]) & (columns[1:] - columns[:-1] > 1))
+    starts = columns[inner] + 1
+    ends = columns[inner + 1]
+    if awake is None:
+        awake = awake_columns(matrix.shape[1])
+    awake_before = np.concatenate([[0], np.cumsum(awake)])
+    awake_slots = awake_before[ends] - awake_before[starts]
+    # Runs opening after midnight but before wake-up keep the rest of that night
+    into_day = starts % SLOTS_PER_DAY
+    night = (into_day > 0) & (into_day < SLEEP_SLOTS)
+    awake_slots += np.where(night, np.minimum(ends, starts - into_day + SLEEP_SLOTS) - starts, 0)
+    return rows[inner], starts, ends, awake_slots
+
+
+def longest_absence(matrix, awake=None):
+    """Longest run of awake empty slots between two sightings, per row (0 if none)."""
+    rows, _, _, awake_slots = absence_runs(matrix, awake)
+    longest = np.zeros(matrix.shape[0], dtype=np.int64)
+    np.maximum.at(longest, rows, awake_slots)
+    return longest
+
+
+def first_last_seen(matrix):
+    """First and last present column per row, -1 for rows without any sighting."""
+    seen = matrix.any(axis=1)
+    first = np.where(seen, matrix.argmax(axis=1), -1)
+    last = np.where(seen, matrix.shape[1] - 1 - matrix[:, ::-1].argmax(axis=1), -1)
+    return first, last
+
+
+def present_in_all(matrix, columns):
+    """Rows present in every one of the given columns."""
+    return matrix[:, list(columns)].all(axis=1)
+
+
+def gap_bounds(entity_ids, gap_starts, gap_ends, lower, upper):
+    """
+    Exact timestamps around absence runs found on the bitmaps: the last event before each
+    run and the event right after that one, within [lower, upper]. One LATERAL query for
+    all runs; runs without an event on both sides are left out. Taking the successor of the
+    last event, rather than the first event after the run, keeps the result exact even if
+    a bitmap lags behind the events table.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute("""
+            SELECT c.i, prev.timestamp, next.timestamp
+            FROM unnest(%(entity_ids)s::varchar[], %(starts)s::timestamptz[], %(ends)s::timestamptz[])
+                 WITH ORDINALITY AS c(entity_id, gap_start, gap_end, i)
+            CROSS JOIN LATERAL (
+                SELECT timestamp FROM events e
+                WHERE e.entity_id = c.entity_id AND e.timestamp < c.gap_start AND e.timestamp >= %(lower)s
+                ORDER BY e.timestamp DESC LIMIT 1
+            ) prev
+            CROSS JOIN LATERAL (
+                SELECT timestamp FROM events e
+                WHERE e.entity_id = c.entity_id AND e.timestamp > prev.timestamp AND e.timestamp <= %(upper)s
+                ORDER BY e.timestamp LIMIT 1
+            ) next
+            ORDER BY c.i
+        """, {
+            "entity_ids": list(entity_ids),
+            "starts": list(gap_starts),
+            "ends": list(gap_ends),
+            "lower": lower,
+            "upper": upper,
+        })
+        return {i - 1: (prev, nxt) for i, prev, nxt in cursor.fetchall()}
+
+
+def daily_attendance(day, slots=(), entity_ids=None):
+    """
+    First/last sighting, longest absence and presence in all of `slots` (times of day) for
+    the given entities, or everyone seen on `day`, computed from the bitmaps alone.
+    """
+    if entity_ids is None:
+        entity_ids = DailyPresence.objects.filter(day=day).order_by("entity_id").values_list("entity_id", flat=True)
+    entity_ids = list(entity_ids)
+    tz = ZoneInfo(settings.CAMPUS_TIME_ZONE)
+    matrix = load_presence(entity_ids, day, day)
+    first, last = first_last_seen(matrix)
+    longest = longest_absence(matrix)
+    columns = [min(SLOTS_PER_DAY - 1, (slot.hour * 60 + slot.minute) // 15) for slot in slots]
+    attended = present_in_all(matrix, columns)
+    return [
+        {
+            "entity_id": entity_id,
+            "first_seen": slot_start(first[i], day, tz) if first[i] >= 0 else None,
+            "last_seen": slot_start(last[i], day, tz) + timedelta(seconds=SLOT_SECONDS) if last[i] >= 0 else None,
+            "slots_present": int(matrix[i].sum()),
+            "longest_absence_minutes": int(longest[i]) * SLOT_SECONDS // 60,
+            "present_in_all": bool(attended[i]),
+        }
+        for i, entity_id in enumerate(entity_ids)
+    ]
@@ -16,7 +16,14 @@ class ProfileSerializer(serializers.ModelSerializer):
             "face_id",
             "device_hash",
             "created_at",
+            "last_seen",
         ]
+        read_only_fields = ["last_seen"]
+
+class EntityDailyActivitySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = models.EntityDailyActivity
+        fields = ["day", "first_seen", "last_seen", "event_count", "event_counts", "locations"]
 
 class EventSerializer(serializers.ModelSerializer):
     class Meta:
@@ -98,12 +105,65 @@ class TimelineEventSerializer(serializers.Serializer):
     lab_bookings = LabBookingSerializer(many=True, read_only=True)
     library_checkout = LibraryCheckoutSerializer(many=True, read_only=True)
 
+class TimelineSummarySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = models.TimelineSummary
+        fields = ["id", "entity", "start_time", "end_time", "status", "summary", "created_at", "updated_at"]
+
+class PresenceTermSerializer(serializers.Serializer):
+    location = serializers.CharField(max_length=120)
+    start = serializers.DateTimeField()
+    end = serializers.DateTimeField()
+
+    def validate(self, attrs):
+        if attrs["end"] < attrs["start"]:
+            raise serializers.ValidationError("end must not be before start")
+        return attrs
+
+class PresenceQuerySerializer(serializers.Serializer):
+    terms = serializers.ListField(child=PresenceTermSerializer(), min_length=1, max_length=10)
+    op = serializers.ChoiceField(choices=["and", "or"], default="and")
+    count_only = serializers.BooleanField(default=False)
+
+class AttendanceQuerySerializer(serializers.Serializer):
+    date = serializers.DateField()
+    slots = serializers.ListField(child=serializers.TimeField(), max_length=96, default=list)
+    entity_ids = serializers.ListField(child=serializers.CharField(max_length=120), max_length=5000, required=False)
+
+class TimelineCompareSerializer(serializers.Serializer):
+    entity_ids = serializers.ListField(child=serializers.CharField(max_length=32), min_length=2, max_length=10)
+    date = serializers.DateField()
+    summaries = serializers.BooleanField(default=False)
+
+    def validate_entity_ids(self, value):
+        if len(set(value)) != len(value):
+            raise serializers.ValidationError("entity_ids must not repeat")
+        return value
+
 class FaceSearchRequestSerializer(serializers.Serializer):
     embedding = serializers.ListField(
         child=serializers.FloatField(),
         min_length=512,
         max_length=512
     )
+    # Index search settings; higher values are slower but miss fewer true matches
+    ef_search = serializers.IntegerField(min_value=1, max_value=1000, required=False)
+    probes = serializers.IntegerField(min_value=1, max_value=1000, required=False)
+    # Top-k mode: ranked candidates, one per profile
+    k = serializers.IntegerField(min_value=1, max_value=50, required=False)
+    roles = serializers.ListField(child=serializers.ChoiceField(choices=models.ROLE_CHOICES), required=False)
+    departments = serializers.ListField(child=serializers.CharField(max_length=108), required=False)
+
+
+class FaceBatchSearchRequestSerializer(serializers.Serializer):
+    embeddings = serializers.ListField(
+        child=serializers.ListField(child=serializers.FloatField(), min_length=512, max_length=512),
+        min_length=1,
+        max_length=100
+    )
+    k = serializers.IntegerField(min_value=1, max_value=10, default=1)
+    ef_search = serializers.IntegerField(min_value=1, max_value=1000, required=False)
+    probes = serializers.IntegerField(min_value=1, max_value=1000, required=False)
 
 
 class OccupancyDataSerializer(serializers.ModelSerializer):
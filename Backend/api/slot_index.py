@@ -0,0 +1,105 @@
+from datetime import timedelta
+import numpy as np
+from django.db import connection
+from .models import LocationSlot
+
+SLOT = timedelta(minutes=15)
+
+# Entities get the next free ordinals in entity_id order, keeping the numbering dense
+_ASSIGN_ORDINALS_SQL = """
+    INSERT INTO entity_ordinals (ordinal, entity_id)
+    SELECT (SELECT COALESCE(MAX(ordinal), -1) FROM entity_ordinals) + ROW_NUMBER() OVER (ORDER BY n.entity_id),
+           n.entity_id
+    FROM (SELECT DISTINCT entity_id FROM events WHERE entity_id IS NOT NULL {condition}) n
+    WHERE NOT EXISTS (SELECT 1 FROM entity_ordinals o WHERE o.entity_id = n.entity_id)
+"""
+
+# Members of the given (location, slot_start) pairs, recomputed from events
+_SLOT_MEMBERS_SQL = """
+    INSERT INTO location_slots (location, slot_start, members)
+    SELECT a.location, a.slot_start, array_agg(DISTINCT o.ordinal ORDER BY o.ordinal)
+    FROM ({affected}) a
+    JOIN events e ON e.location = a.location AND e.timestamp >= a.slot_start AND e.timestamp < a.slot_start + %(slot)s
+    JOIN entity_ordinals o ON o.entity_id = e.entity_id
+    GROUP BY a.location, a.slot_start
+    ON CONFLICT (location, slot_start) DO UPDATE SET members = EXCLUDED.members
+"""
+
+_SLOT_OF = "date_bin(%(slot)s, {column}, to_timestamp(0))"
+
+
+def refresh_location_slots(since):
+    """Recomputes every slot that received events created at or after `since`."""
+    params = {"since": since, "slot": SLOT}
+    with connection.cursor() as cursor:
+        cursor.execute("LOCK TABLE entity_ordinals IN EXCLUSIVE MODE")
+        cursor.execute(_ASSIGN_ORDINALS_SQL.format(condition="AND created_at >= %(since)s"), params)
+        cursor.execute(_SLOT_MEMBERS_SQL.format(affected=f"""
+            SELECT DISTINCT location, {_SLOT_OF.format(column="timestamp")} AS slot_start
+            FROM events
+            WHERE created_at >= %(since)s AND entity_id IS NOT NULL AND location IS NOT NULL
+        """), params)
+        return cursor.rowcount
+
+
+def rebuild_location_slots(entity_ids=None):
+    """
+    Rebuilds the whole index, or only the slots some entities appear in. The latter also
+    drops the entities from slots whose events were deleted, since it starts from the
+    stored members.
+    """
+    params = {"slot": SLOT, "entity_ids": list(entity_ids) if entity_ids is not None else None}
+    with connection.cursor() as cursor:
+        cursor.execute("LOCK TABLE entity_ordinals IN EXCLUSIVE MODE")
+        if entity_ids is None:
+            cursor.execute("TRUNCATE location_slots")
+            cursor.execute(_ASSIGN_ORDINALS_SQL.format(condition=""), params)
+            affected = f"""
+                SELECT DISTINCT location, {_SLOT_OF.format(column="timestamp")} AS slot_start
+                FROM events
+                WHERE entity_id IS NOT NULL AND location IS NOT NULL
+            """
+        else:
+            cursor.execute(_ASSIGN_ORDINALS_SQL.format(condition="AND entity_id = ANY(%(entity_ids)s)"), params)
+            # Take the entities out of every slot, then add them back where their events still are
+            cursor.execute("""
+                WITH ordinals AS (
+                    SELECT array_agg(ordinal)::integer[] AS removed FROM entity_ordinals WHERE entity_id = ANY(%(entity_ids)s)
+                )
+                UPDATE location_slots s
+                SET members = ARRAY(SELECT m FROM unnest(s.members) m WHERE m <> ALL(o.removed) ORDER BY m)
+                FROM ordinals o
+                WHERE s.members && o.removed
+            """, params)
+            cursor.execute("DELETE FROM location_slots WHERE cardinality(members) = 0")
+            affected = f"""
+                SELECT DISTINCT location, {_SLOT_OF.format(column="timestamp")} AS slot_start
+                FROM events
+                WHERE entity_id = ANY(%(entity_ids)s) AND location IS NOT NULL
+            """
+        cursor.execute(_SLOT_MEMBERS_SQL.format(affected=affected), params)
+        return cursor.rowcount
+
+
+def slot_members(location, start_time, end_time):
+    """Sorted unique ordinals of everyone seen at `location` in a slot overlapping [start_time, end_time]."""
+    arrays = LocationSlot.objects.filter(
+        location=location,
+        slot_start__gt=start_time - SLOT,
+        slot_start__lte=end_time
+    ).values_list("members", flat=True)
+    arrays = [np.asarray(members, dtype=np.int32) for members in arrays]
+    if not arrays:
+        return np.empty(0, dtype=np.int32)
+    return np.unique(np.concatenate(arrays))
+
+
+def combine(sets, op="and"):
+    """Intersection (`and`) or union (`or`) of sorted unique ordinal arrays."""
+    result = sets[0]
+    for members in sets[1:]:
+        if op == "and":
+            result = np.intersect1d(result, members, assume_unique=True)
+        else:
+            result = np.union1d(result, members)
+    return result
@@ -0,0 +1,77 @@
+from datetime import timedelta
+from django.db import connection
+
+# Two events at the same location further apart than this start a new stay
+STAY_MAX_GAP = timedelta(hours=2)
+
+# Consecutive events of an entity at one location form a stay (gaps-and-islands)
+_ISLANDS_SQL = """
+    SELECT entity_id, location, MIN(timestamp), MAX(timestamp), COUNT(*), AVG(confidence)
+    FROM (
+        SELECT entity_id, location, timestamp, confidence,
+               SUM(new_stay) OVER (PARTITION BY entity_id ORDER BY timestamp, event_id) AS stay_no
+        FROM (
+            SELECT e.entity_id, e.location, e.timestamp, e.confidence, e.event_id,
+                   CASE WHEN e.location IS DISTINCT FROM LAG(e.location) OVER w
+                          OR e.timestamp - LAG(e.timestamp) OVER w > %(gap)s
+                        THEN 1 ELSE 0 END AS new_stay
+            FROM events e
+            {source}
+            WHERE e.entity_id IS NOT NULL AND e.location IS NOT NULL {condition}
+            WINDOW w AS (PARTITION BY e.entity_id ORDER BY e.timestamp, e.event_id)
+        ) marked
+    ) numbered
+    GROUP BY entity_id, location, stay_no
+"""
+
+_INSERT = "INSERT INTO stays (entity_id, location, start_time, end_time, event_count, mean_confidence) "
+
+
+def refresh_stays(since, gap=STAY_MAX_GAP):
+    """
+    Folds events created at or after `since` into the stays table in one statement.
+
+    For every entity with new events, stays that end within `gap` of its earliest new
+    event are dropped and rebuilt together with the new events, so late events can
+    extend, merge or split existing stays. Returns the number of stays written.
+    """
+    sql = f"""
+        WITH affected AS (
+            SELECT entity_id, MIN(timestamp) AS first_new
+            FROM events
+            WHERE created_at >= %(since)s AND entity_id IS NOT NULL AND location IS NOT NULL
+            GROUP BY entity_id
+        ), dropped AS (
+            DELETE FROM stays s
+            USING affected a
+            WHERE s.entity_id = a.entity_id AND s.end_time >= a.first_new - %(gap)s
+            RETURNING s.entity_id, s.start_time
+        ), bounds AS (
+            SELECT a.entity_id, LEAST(a.first_new, MIN(d.start_time)) AS rebuild_from
+            FROM affected a
+            LEFT JOIN dropped d ON d.entity_id = a.entity_id
+            GROUP BY a.entity_id, a.first_new
+        )
+        {_INSERT}
+        {_ISLANDS_SQL.format(
+            source="JOIN bounds b ON b.entity_id = e.entity_id",
+            condition="AND e.timestamp >= b.rebuild_from"
+        )}
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, {"since": since, "gap": gap})
+        return cursor.rowcount
+
+
+def rebuild_stays(entity_ids=None, gap=STAY_MAX_GAP):
+    """Recomputes the stays of the given entities, or of everyone, from the raw events."""
+    params = {"gap": gap, "entity_ids": list(entity_ids) if entity_ids is not None else None}
+    with connection.cursor() as cursor:
+        if entity_ids is None:
+            cursor.execute("TRUNCATE stays")
+            condition = ""
+        else:
+            cursor.execute("DELETE FROM stays WHERE entity_id = ANY(%(entity_ids)s)", params)
+            condition = "AND e.entity_id = ANY(%(entity_ids)s)"
+        cursor.execute(_INSERT + _ISLANDS_SQL.format(source="", condition=condition), params)
+        return cursor.rowcount
@@ -3,7 +3,7 @@ import pandas as pd
 import google.generativeai as genai
 from datetime import datetime, time
 from asgiref.sync import sync_to_async
-from .models import Event
+from .models import Stay
 import asyncio
 
 
@@ -19,66 +19,74 @@ except Exception as e:
     model = None
 
 
+class SummaryUnavailable(Exception):
+    """The summary could not be generated; retrying later may succeed."""
 
-def timeline_to_human_text(timeline_df):
-    if timeline_df.empty:
-        return ""
 
-    lines = []
-    timeline_df['timestamp'] = pd.to_datetime(timeline_df['timestamp'])
-    timeline_df = timeline_df.sort_values('timestamp').reset_index(drop=True)
-
-    timeline_df['location'] = timeline_df['location'].ffill()
-    timeline_df.dropna(subset=['location'], inplace=True)
+def location_stays(timeline_df):
+    """
+    Collapses consecutive events at the same location into stays.
 
+    A stay starts at its first event and ends at the first event of the next stay; the
+    last stay ends at the last event. Events without a location inherit the previous one.
+    Returns a DataFrame with `location`, `start`, `end` and `duration_minutes` columns.
+    """
+    columns = ["location", "start", "end", "duration_minutes"]
     if timeline_df.empty:
-        return ""
+        return pd.DataFrame(columns=columns)
 
-    start_time = timeline_df.iloc[0]['timestamp']
-    current_location = timeline_df.iloc[0]['location']
+    df = timeline_df[["timestamp", "location"]].copy()
+    df["timestamp"] = pd.to_datetime(df["timestamp"])
+    df = df.sort_values("timestamp", kind="stable")
+    df["location"] = df["location"].ffill()
+    df = df.dropna(subset=["location"])
+    if df.empty:
+        return pd.DataFrame(columns=columns)
 
-    for i in range(1, len(timeline_df)):
-        entry = timeline_df.iloc[i]
-        if entry['location'] != current_location:
-            end_time = entry['timestamp']
-            duration_minutes = round((end_time - start_time).total_seconds() / 60)
+    # A new run starts wherever the location differs from the previous row
+    run_id = (df["location"] != df["location"].shift()).cumsum()
+    stays = df.groupby(run_id, sort=False).agg(location=("location", "first"), start=("timestamp", "first"))
+    stays = stays.reset_index(drop=True)
+    stays["end"] = stays["start"].shift(-1).fillna(df["timestamp"].iloc[-1])
+    stays["duration_minutes"] = ((stays["end"] - stays["start"]).dt.total_seconds() / 60).round().astype(int)
+    return stays[columns]
 
-            if duration_minutes > 1:
-                lines.append(
-                    f"From {start_time.strftime('%H:%M')} to {end_time.strftime('%H:%M')} ({duration_minutes} minutes), the person was at {current_location}."
-                )
 
-            start_time = entry['timestamp']
-            current_location = entry['location']
-
-    end_time = timeline_df.iloc[-1]['timestamp']
-    duration_minutes = round((end_time - start_time).total_seconds() / 60)
-    if duration_minutes > 1:
-        lines.append(
-            f"From {start_time.strftime('%H:%M')} to {end_time.strftime('%H:%M')} ({duration_minutes} minutes), the person was at {current_location}."
-        )
+def timeline_to_human_text(timeline_df):
+    stays = location_stays(timeline_df)
+    stays = stays[stays["duration_minutes"] > 1]
+    if stays.empty:
+        return ""
 
+    lines = (
+        "From " + stays["start"].dt.strftime("%H:%M") + " to " + stays["end"].dt.strftime("%H:%M")
+        + " (" + stays["duration_minutes"].astype(str) + " minutes), the person was at "
+        + stays["location"].astype(str) + "."
+    )
     return " ".join(lines)
 
 
 
 async def get_summary_for_entity(entity_id: str, start_time: datetime, end_time: datetime) -> str:
     if not model:
-        return "Error: Summarization model is not available."
+        raise SummaryUnavailable("Summarization model is not available.")
 
-    events_qs = Event.objects.filter(
-        entity__entity_id=entity_id,
-        timestamp__gte=start_time,
-        timestamp__lte=end_time,
-        location__isnull=False
-    ).order_by('timestamp')
+    stays_qs = Stay.objects.filter(
+        entity_id=entity_id,
+        start_time__lte=end_time,
+        end_time__gte=start_time
+    ).order_by('start_time')
 
-    events_data = await sync_to_async(list)(events_qs.values('timestamp', 'location', 'event_type'))
+    stays = await sync_to_async(list)(stays_qs.values('location', 'start_time', 'end_time'))
 
-    if not events_data:
+    if not stays:
         return "No activity with location data found for this person in the selected time range."
 
-    timeline_df = pd.DataFrame(events_data)
+    # Stay starts plus the end of the last stay are all location_stays needs from the raw events
+    timeline_df = pd.DataFrame(
+        [{"timestamp": max(stay["start_time"], start_time), "location": stay["location"]} for stay in stays]
+        + [{"timestamp": min(stays[-1]["end_time"], end_time), "location": stays[-1]["location"]}]
+    )
     human_readable_text = timeline_to_human_text(timeline_df)
 
     if not human_readable_text:
@@ -106,4 +114,4 @@ async def get_summary_for_entity(entity_id: str, start_time: datetime, end_time:
         return response.text.strip()
     except Exception as e:
         print(f"Error calling Gemini API: {e}")
-        return "An error occurred while generating the summary."
+        raise SummaryUnavailable("An error occurred while generating the summary.") from e
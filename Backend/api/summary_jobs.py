@@ -0,0 +1,64 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from asgiref.sync import async_to_sync
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from .models import Event, TimelineSummary
+from .summarizer import SummaryUnavailable, get_summary_for_entity
+
+SUMMARY_WORKERS = int(os.getenv("TIMELINE_SUMMARY_WORKERS", "4"))
+# A pending summary older than this is assumed lost (e.g. the process restarted) and re-queued
+PENDING_TIMEOUT = timedelta(minutes=5)
+
+_executor = ThreadPoolExecutor(max_workers=SUMMARY_WORKERS, thread_name_prefix="timeline-summary")
+
+
+def request_summary(entity_id, start_time, end_time):
+    """
+    Returns the TimelineSummary of an entity's time range, queuing a background job when
+    there is no usable one yet. Ready summaries are reused until new events land in the range.
+    """
+    with transaction.atomic():
+        summary, created = TimelineSummary.objects.select_for_update().get_or_create(
+            entity_id=entity_id, start_time=start_time, end_time=end_time
+        )
+        if not created and not needs_refresh(summary):
+            return summary
+        if not created:
+            summary.status = "pending"
+            summary.summary = ""
+            summary.save(update_fields=["status", "summary", "updated_at"])
+        transaction.on_commit(lambda: _executor.submit(_generate, summary.id))
+    return summary
+
+
+def needs_refresh(summary):
+    if summary.status == "failed":
+        return True
+    if summary.status == "pending":
+        return summary.updated_at < timezone.now() - PENDING_TIMEOUT
+    return Event.objects.filter(
+        entity_id=summary.entity_id,
+        timestamp__gte=summary.start_time,
+        timestamp__lte=summary.end_time,
+        created_at__gt=summary.updated_at
+    ).exists()
+
+
+def _generate(summary_id):
+    close_old_connections()
+    try:
+        summary = TimelineSummary.objects.get(pk=summary_id)
+        try:
+            text = async_to_sync(get_summary_for_entity)(summary.entity_id, summary.start_time, summary.end_time)
+            status = "ready"
+        except SummaryUnavailable as e:
+            text = str(e)
+            status = "failed"
+        TimelineSummary.objects.filter(pk=summary_id).update(status=status, summary=text, updated_at=timezone.now())
+    except Exception as e:
+        print(f"Error generating timeline summary {summary_id}: {e}")
+        TimelineSummary.objects.filter(pk=summary_id).update(status="failed", updated_at=timezone.now())
+    finally:
+        close_old_connections()
@@ -1,3 +1,333 @@
-from django.test import TestCase
+from datetime import datetime, timedelta, timezone
+from unittest import mock
+import numpy as np
+import pandas as pd
+from django.test import SimpleTestCase, TestCase
+from . import face_index, gap_detection, presence
+from .alerts import AlertEvaluator
+from .face_search import ranked_profiles
+from .models import AccessRule, Alert, Event, FaceEmbedding, Profile
+from .summarizer import location_stays, timeline_to_human_text
+from .timeline import aligned_axis, stay_overlaps
 
-# Create your tests here.
+
+HOUR = 3600
+# Local midnight of an arbitrary day, in gap_detection's local seconds
+MIDNIGHT = 20000 * gap_detection.SECONDS_PER_DAY
+
+
+class SleepOverlapTests(SimpleTestCase):
+    def overlap(self, start_hours, end_hours):
+        return int(gap_detection.sleep_overlap(
+            [MIDNIGHT + start_hours * HOUR], [MIDNIGHT + end_hours * HOUR]
+        )[0]) / HOUR
+
+    def test_gap_inside_sleep_window_does_not_count(self):
+        # The window's midnight is not inside the gap
+        self.assertEqual(self.overlap(1, 5), 0)
+        self.assertEqual(self.overlap(2, 10), 0)
+
+    def test_gap_crossing_midnight(self):
+        self.assertEqual(self.overlap(22, 24 + 9), 7)
+        self.assertEqual(self.overlap(22, 24 + 3), 3)
+
+    def test_gap_spanning_several_nights(self):
+        self.assertEqual(self.overlap(20, 3 * 24 + 10), 21)
+        self.assertEqual(self.overlap(20, 3 * 24 + 2), 16)
+
+    def test_gap_without_overlap(self):
+        self.assertEqual(self.overlap(9, 18), 0)
+
+    def test_vectorized_over_gaps(self):
+        overlaps = gap_detection.sleep_overlap(
+            [MIDNIGHT + 22 * HOUR, MIDNIGHT + 9 * HOUR],
+            [MIDNIGHT + 33 * HOUR, MIDNIGHT + 18 * HOUR]
+        )
+        self.assertEqual(overlaps.tolist(), [7 * HOUR, 0])
+
+
+def pack_slots(slots):
+    """(slots_lo, slots_hi) as stored in daily_presence: signed bigints holding the slot bits."""
+    bits = sum(1 << slot for slot in slots)
+    lo, hi = bits & (2 ** 64 - 1), bits >> 64
+    return lo - 2 ** 64 if lo >= 2 ** 63 else lo, hi
+
+
+class PresenceBitmapTests(SimpleTestCase):
+    def matrix(self, *days):
+        """One entity row over the given days, each a collection of present slots."""
+        packed = [pack_slots(slots) for slots in days]
+        unpacked = presence.unpack_slots([lo for lo, _ in packed], [hi for _, hi in packed])
+        return unpacked.reshape(1, -1)
+
+    def test_unpack_word_boundary_and_last_slot(self):
+        row = self.matrix({0, 63, 64, 95})[0]
+        self.assertEqual(np.flatnonzero(row).tolist(), [0, 63, 64, 95])
+
+    def test_run_across_word_boundary(self):
+        rows, starts, ends, awake_slots = presence.absence_runs(self.matrix({60, 70}))
+        self.assertEqual((rows.tolist(), starts.tolist(), ends.tolist()), ([0], [61], [70]))
+        self.assertEqual(awake_slots.tolist(), [9])
+
+    def test_all_absent_day(self):
+        matrix = self.matrix(set())
+        self.assertEqual(len(presence.absence_runs(matrix)[0]), 0)
+        self.assertEqual(presence.longest_absence(matrix).tolist(), [0])
+        first, last = presence.first_last_seen(matrix)
+        self.assertEqual((first.tolist(), last.tolist()), ([-1], [-1]))
+
+    def test_all_present_day(self):
+        matrix = self.matrix(range(presence.SLOTS_PER_DAY))
+        self.assertTrue(matrix.all())
+        self.assertEqual(len(presence.absence_runs(matrix)[0]), 0)
+        self.assertEqual(presence.longest_absence(matrix).tolist(), [0])
+        first, last = presence.first_last_seen(matrix)
+        self.assertEqual((first.tolist(), last.tolist()), ([0], [95]))
+
+    def test_last_slot(self):
+        matrix = self.matrix({40, 95})
+        self.assertEqual(presence.longest_absence(matrix).tolist(), [54])
+        first, last = presence.first_last_seen(matrix)
+        self.assertEqual((first.tolist(), last.tolist()), ([40], [95]))
+
+        first, last = presence.first_last_seen(self.matrix({95}))
+        self.assertEqual((first.tolist(), last.tolist()), ([95], [95]))
+
+    def test_run_across_midnight_skips_sleep(self):
+        # 20:00 until 10:00 the next day; 00:00-07:00 is sleep
+        self.assertEqual(presence.longest_absence(self.matrix({80}, {40})).tolist(), [15 + 12])
+
+    def test_longest_absence_per_row(self):
+        matrix = np.vstack([self.matrix({30, 40, 70}), self.matrix({30, 31}), self.matrix(set())])
+        self.assertEqual(presence.longest_absence(matrix).tolist(), [29, 0, 0])
+
+
+class LocationStaysTests(SimpleTestCase):
+    def timeline(self, rows):
+        return pd.DataFrame([
+            {"timestamp": pd.Timestamp(f"2025-09-01 {clock}"), "location": location} for clock, location in rows
+        ])
+
+    def test_stays_and_text(self):
+        timeline = self.timeline([
+            ("09:30", "Cafe"),
+            ("08:00", "Library"),
+            ("08:20", "Library"),
+            ("08:45", None),
+            ("09:00", "Lab"),
+            ("09:31", "Library"),
+            ("10:00", "Library"),
+        ])
+
+        stays = location_stays(timeline)
+        self.assertEqual(stays["location"].tolist(), ["Library", "Lab", "Cafe", "Library"])
+        self.assertEqual(stays["start"].dt.strftime("%H:%M").tolist(), ["08:00", "09:00", "09:30", "09:31"])
+        self.assertEqual(stays["end"].dt.strftime("%H:%M").tolist(), ["09:00", "09:30", "09:31", "10:00"])
+        self.assertEqual(stays["duration_minutes"].tolist(), [60, 30, 1, 29])
+
+        # Stays of a minute or less are left out of the text
+        self.assertEqual(timeline_to_human_text(timeline), (
+            "From 08:00 to 09:00 (60 minutes), the person was at Library. "
+            "From 09:00 to 09:30 (30 minutes), the person was at Lab. "
+            "From 09:31 to 10:00 (29 minutes), the person was at Library."
+        ))
+
+    def test_single_row(self):
+        timeline = self.timeline([("08:00", "Library")])
+        stays = location_stays(timeline)
+        self.assertEqual(stays["location"].tolist(), ["Library"])
+        self.assertEqual(stays["duration_minutes"].tolist(), [0])
+        self.assertEqual(timeline_to_human_text(timeline), "")
+
+    def test_rows_without_location(self):
+        self.assertTrue(location_stays(self.timeline([("08:00", None), ("09:00", None)])).empty)
+        self.assertTrue(location_stays(pd.DataFrame(columns=["timestamp", "location"])).empty)
+        self.assertEqual(timeline_to_human_text(self.timeline([("08:00", None)])), "")
+
+
+class TimelineComparisonTests(SimpleTestCase):
+    def at(self, clock):
+        hour, minute = map(int, clock.split(":"))
+        return datetime(2025, 9, 1, hour, minute, tzinfo=timezone.utc)
+
+    def stays(self, *spans):
+        return [
+            {"location": location, "start_time": self.at(start), "end_time": self.at(end)}
+            for location, start, end in spans
+        ]
+
+    def setUp(self):
+        self.compared = {
+            "A": self.stays(("Library", "09:00", "10:00"), ("Lab", "10:00", "11:00")),
+            "B": self.stays(("Library", "09:30", "10:30"), ("Lab", "11:00", "12:00")),
+            "C": [],
+        }
+
+    def test_partial_and_touching_overlaps(self):
+        overlaps = stay_overlaps(self.compared)
+        self.assertEqual(
+            [(o["location"], o["entity_ids"], o["start_time"], o["end_time"], o["minutes"]) for o in overlaps],
+            [
+                ("Library", ["A", "B"], self.at("09:30"), self.at("10:00"), 30.0),
+                # Stays that only touch meet for zero minutes
+                ("Lab", ["A", "B"], self.at("11:00"), self.at("11:00"), 0.0),
+            ]
+        )
+
+    def test_aligned_axis(self):
+        axis = aligned_axis(self.compared)
+        self.assertEqual(
+            [(s["start_time"], s["end_time"], s["locations"], s["shared"]) for s in axis],
+            [
+                (self.at("09:00"), self.at("09:30"), {"A": "Library", "B": None, "C": None}, {}),
+                (self.at("09:30"), self.at("10:00"), {"A": "Library", "B": "Library", "C": None}, {"Library": ["A", "B"]}),
+                (self.at("10:00"), self.at("10:30"), {"A": "Lab", "B": "Library", "C": None}, {}),
+                (self.at("10:30"), self.at("11:00"), {"A": "Lab", "B": None, "C": None}, {}),
+                (self.at("11:00"), self.at("12:00"), {"A": None, "B": "Lab", "C": None}, {}),
+            ]
+        )
+
+    def test_segments_without_stays_are_left_out(self):
+        axis = aligned_axis({
+            "A": self.stays(("Library", "09:00", "10:00")),
+            "B": self.stays(("Library", "11:00", "12:00")),
+        })
+        self.assertEqual([(s["start_time"], s["end_time"]) for s in axis], [
+            (self.at("09:00"), self.at("10:00")),
+            (self.at("11:00"), self.at("12:00")),
+        ])
+
+    def test_entities_without_stays(self):
+        self.assertEqual(aligned_axis({"A": [], "B": []}), [])
+        self.assertEqual(stay_overlaps({"A": [], "B": []}), [])
+        self.assertEqual(stay_overlaps({"A": self.stays(("Library", "09:00", "10:00")), "B": []}), [])
+
+
+class GalleryTests(SimpleTestCase):
+    def vector(self, axis):
+        vector = np.zeros(face_index.DIMENSIONS, dtype=np.float32)
+        vector[axis] = 1
+        return vector
+
+    def setUp(self):
+        self.gallery = face_index.Gallery(
+            np.stack([self.vector(0), self.vector(1), self.vector(2)]),
+            np.array(["f1", "f2", "f3"], dtype=object),
+            np.array(["P1", "P2", "P3"], dtype=object),
+            datetime(2025, 9, 1, tzinfo=timezone.utc),
+        )
+
+    def updated(self, gallery, changed=(), deleted=()):
+        """Gallery.updated() with the database returning the given batches."""
+        changed_rows = mock.Mock(**{"values_list.return_value": list(changed)})
+        deleted_rows = mock.Mock(**{"values_list.return_value": list(deleted)})
+        with mock.patch.object(face_index.FaceEmbedding.objects, "filter", return_value=changed_rows), \
+                mock.patch.object(face_index.FaceEmbeddingDeletion.objects, "filter", return_value=deleted_rows):
+            return gallery.updated(gallery.version)
+
+    def ranked(self, gallery, axis):
+        return [(c["face_id"], c["profile_id"]) for c in gallery.ranked_profiles(self.vector(axis), 5, 0.5)]
+
+    def test_updated_vector_is_ranked(self):
+        # f1 moves from axis 0 to axis 3
+        gallery = self.updated(self.gallery, changed=[("f1", "P1", self.vector(3))])
+        self.assertEqual(self.ranked(gallery, 3), [("f1", "P1")])
+        self.assertEqual(self.ranked(gallery, 0), [])
+        self.assertEqual(len(gallery), 3)
+
+    def test_deleted_profile_is_gone(self):
+        gallery = self.updated(self.gallery, changed=[("f4", "P4", self.vector(4))])
+        gallery = self.updated(gallery, deleted=["f2", "f4"])
+        self.assertEqual(self.ranked(gallery, 1), [])
+        self.assertEqual(self.ranked(gallery, 4), [])
+        self.assertEqual(self.ranked(gallery, 2), [("f3", "P3")])
+        self.assertEqual(len(gallery), 2)
+
+    def test_unchanged_without_batches(self):
+        gallery = self.updated(self.gallery)
+        self.assertEqual(self.ranked(gallery, 0), [("f1", "P1")])
+        self.assertEqual(len(gallery), 3)
+
+
+class IncidentAlertTests(TestCase):
+    def setUp(self):
+        self.profile = Profile.objects.create(entity_id="E1", name="Asha", role="student", student_id="S1")
+        AccessRule.objects.create(location="LAB_1", role="staff")
+        self.start = datetime(2025, 9, 1, 10, tzinfo=timezone.utc)
+        self.evaluator = AlertEvaluator(incident_gap=timedelta(minutes=30))
+
+    def add_events(self, *minutes):
+        return [
+            Event.objects.create(
+                entity=self.profile,
+                location="LAB_1",
+                timestamp=self.start + timedelta(minutes=minute),
+                event_type="card_swipes"
+            ).event_id
+            for minute in minutes
+        ]
+
+    def evaluate(self, event_ids):
+        return self.evaluator.evaluate_access_violations(Event.objects.filter(event_id__in=event_ids))
+
+    def test_late_incidents_inside_stored_alert(self):
+        self.evaluate(self.add_events(*range(0, 181, 20)))
+        stored = Alert.objects.get()
+
+        # Both late events lie inside the stored incident but more than incident_gap apart
+        late = self.add_events(5, 125)
+        self.assertEqual(self.evaluate(late), 1)
+
+        alert = Alert.objects.get()
+        self.assertEqual(alert.fingerprint, stored.fingerprint)
+        self.assertEqual(alert.occurrences, 12)
+        self.assertEqual(alert.occurred_at, self.start)
+        self.assertEqual(alert.last_seen_at, self.start + timedelta(minutes=180))
+
+        # Re-processing the same events changes nothing
+        self.evaluate(late)
+        self.assertEqual(Alert.objects.get().occurrences, 12)
+
+    def test_late_event_merges_stored_incidents(self):
+        self.evaluate(self.add_events(0, 20, 70, 90))
+        first = Alert.objects.order_by("occurred_at").first()
+        self.assertEqual(Alert.objects.count(), 2)
+
+        self.evaluate(self.add_events(45))
+
+        alert = Alert.objects.get()
+        self.assertEqual(alert.fingerprint, first.fingerprint)
+        self.assertEqual(alert.occurrences, 5)
+        self.assertEqual(alert.last_seen_at, self.start + timedelta(minutes=90))
+
+
+class RankedProfilesTests(TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.probe = rng.normal(size=512)
+        # 300 students right next to the probe, 2 faculty members a little further away
+        for i in range(302):
+            faculty = i >= 300
+            profile = Profile.objects.create(
+                entity_id=f"E{i}",
+                name=f"Person {i}",
+                role="faculty" if faculty else "student",
+                staff_id=f"F{i}" if faculty else None,
+                student_id=None if faculty else f"S{i}"
+            )
+            noise = 0.6 if faculty else 0.1
+            FaceEmbedding.objects.create(
+                face_id=f"FACE{i}",
+                profile=profile,
+                embedding=(self.probe + rng.normal(scale=noise, size=512)).tolist()
+            )
+
+    def test_selective_filter_finds_all_matches(self):
+        candidates = ranked_profiles(self.probe.tolist(), k=2, threshold=0.4, roles=["faculty"])
+        self.assertEqual({candidate["profile_id"] for candidate in candidates}, {"E300", "E301"})
+        self.assertTrue(all(candidate["distance"] < 0.4 for candidate in candidates))
+
+    def test_unfiltered_search_is_unchanged(self):
+        candidates = ranked_profiles(self.probe.tolist(), k=5, threshold=0.4)
+        self.assertEqual(len(candidates), 5)
+        self.assertTrue(all(candidate["profile_id"] not in {"E300", "E301"} for candidate in candidates))
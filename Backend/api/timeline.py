@@ -0,0 +1,195 @@
+import numpy as np
+from django.db import connection
+from . import serializers
+from .models import Stay
+
+EVENT_COLUMNS = ["event_id", "event_type", "timestamp", "location", "confidence", "created_at"]
+
+# Event type -> response key of its source records and the serializer describing their shape
+TIMELINE_SOURCES = {
+    "wifi_logs": ("wifi_logs", serializers.WifiLogsSerializer),
+    "card_swipes": ("card_swipes", serializers.CardSwipeSerializer),
+    "cctv_frames": ("cctv_frames", serializers.CCTVFrameSerializer),
+    "text_notes": ("notes", serializers.NoteSerializer),
+    "lab_booking": ("lab_bookings", serializers.LabBookingSerializer),
+    "library_checkouts": ("library_checkout", serializers.LibraryCheckoutSerializer),
+}
+
+
+def _source_payload(serializer_class):
+    """
+    Correlated subquery that aggregates an event's source records into a JSON array with
+    the same keys as `serializer_class`, e.g. `event` for the event_id column.
+    """
+    model = serializer_class.Meta.model
+    pairs = ", ".join(
+        f"'{name}', s.{connection.ops.quote_name(model._meta.get_field(name).column)}"
+        for name in serializer_class.Meta.fields
+    )
+    pk = connection.ops.quote_name(model._meta.pk.column)
+    return (
+        f"COALESCE((SELECT json_agg(json_build_object({pairs}) ORDER BY s.{pk}) "
+        f"FROM {connection.ops.quote_name(model._meta.db_table)} s WHERE s.event_id = e.event_id), '[]'::json)"
+    )
+
+
+def fetch_timeline(entity_id, start_time, end_time, types=None, entity=None, after=None, limit=None):
+    """
+    Events of one entity in [start_time, end_time] with their source records, in one query.
+
+    Only the source tables of the requested `types` are joined; the other source keys are
+    returned as empty lists so the response shape does not depend on the filter. Rows come
+    back as plain dicts in TimelineEventSerializer's layout; `entity` is the already
+    serialized profile, shared by every row.
+
+    Events are ordered by (timestamp, event_id). Passing the key of the last row seen as
+    `after` together with `limit` pages through long ranges with a keyset cursor.
+    """
+    requested = set(types) if types else set(TIMELINE_SOURCES)
+    columns = []
+    for event_type, (key, serializer_class) in TIMELINE_SOURCES.items():
+        payload = _source_payload(serializer_class) if event_type in requested else "'[]'::json"
+        columns.append(f"{payload} AS {key}")
+
+    sql = f"""
+        SELECT {", ".join(f"e.{column}" for column in EVENT_COLUMNS)},
+               {", ".join(columns)}
+        FROM events e
+        WHERE e.entity_id = %s AND e.timestamp >= %s AND e.timestamp <= %s
+    """
+    params = [entity_id, start_time, end_time]
+    if types:
+        sql += " AND e.event_type = ANY(%s)"
+        params.append(list(types))
+    if after:
+        sql += " AND e.timestamp >= %s AND (e.timestamp, e.event_id) > (%s, %s::uuid)"
+        params.extend([after[0], after[0], after[1]])
+    sql += " ORDER BY e.timestamp, e.event_id"
+    if limit:
+        sql += " LIMIT %s"
+        params.append(limit)
+
+    sources = [key for key, _ in TIMELINE_SOURCES.values()]
+    timeline = []
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        for row in cursor.fetchall():
+            event = dict(zip(EVENT_COLUMNS, row))
+            event["event_id"] = str(event["event_id"])
+            event["entity"] = entity
+            event.update(zip(sources, row[len(EVENT_COLUMNS):]))
+            timeline.append(event)
+    return timeline
+
+
+def timeline_key(event):
+    """Keyset position of a row returned by fetch_timeline."""
+    return event["timestamp"], event["event_id"]
+
+
+def compare_timelines(entity_ids, start_time, end_time):
+    """
+    Stays of several entities in [start_time, end_time], fetched in one query and clipped
+    to the range, aligned on a shared time axis.
+
+    Returns a dict with `stays` (per entity id), `axis` (segments between consecutive stay
+    boundaries with every entity's location, and the locations shared by two or more of
+    them) and `overlaps` (every pair of entities at the same location at the same time).
+    """
+    stays = {entity_id: [] for entity_id in entity_ids}
+    for stay in Stay.objects.filter(
+        entity_id__in=list(entity_ids),
+        start_time__lte=end_time,
+        end_time__gte=start_time
+    ).order_by("entity_id", "start_time").values("entity_id", "location", "start_time", "end_time", "event_count"):
+        stays[stay.pop("entity_id")].append({
+            **stay,
+            "start_time": max(stay["start_time"], start_time),
+            "end_time": min(stay["end_time"], end_time),
+        })
+    return {"stays": stays, "axis": aligned_axis(stays), "overlaps": stay_overlaps(stays)}
+
+
+def aligned_axis(stays):
+    """
+    Splits the time covered by `stays` ({entity_id: stays sorted by start}) at every stay
+    boundary. Consecutive segments with the same locations are merged; segments where
+    nobody has a stay are left out.
+    """
+    moments = {moment for entity_stays in stays.values() for stay in entity_stays
+               for moment in (stay["start_time"], stay["end_time"])}
+    bounds = sorted(moments)
+    if len(bounds) < 2:
+        return []
+    seconds = np.array([moment.timestamp() for moment in bounds])
+    seg_starts, seg_ends = seconds[:-1], seconds[1:]
+
+    # Location index of every entity in every segment, -1 where it has no stay
+    locations = sorted({stay["location"] for entity_stays in stays.values() for stay in entity_stays})
+    code = {location: i for i, location in enumerate(locations)}
+    grid = np.full((len(stays), len(seg_starts)), -1)
+    for row, entity_stays in enumerate(stays.values()):
+        if not entity_stays:
+            continue
+        starts = np.array([stay["start_time"].timestamp() for stay in entity_stays])
+        ends = np.array([stay["end_time"].timestamp() for stay in entity_stays])
+        codes = np.array([code[stay["location"]] for stay in entity_stays])
+        current = np.searchsorted(starts, seg_starts, side="right") - 1
+        covered = (current >= 0) & (ends[np.maximum(current, 0)] >= seg_ends)
+        grid[row] = np.where(covered, codes[np.maximum(current, 0)], -1)
+
+    # A segment opens wherever any entity's location changes
+    changed = np.concatenate([[True], (grid[:, 1:] != grid[:, :-1]).any(axis=0)])
+    opens = np.flatnonzero(changed)
+    closes = np.append(opens[1:], len(seg_starts))
+
+    axis = []
+    entity_ids = list(stays)
+    for first, last in zip(opens, closes):
+        column = grid[:, first]
+        if (column < 0).all():
+            continue
+        present = {entity_ids[row]: locations[column[row]] for row in np.flatnonzero(column >= 0)}
+        shared = {}
+        for entity_id, location in present.items():
+            shared.setdefault(location, []).append(entity_id)
+        axis.append({
+            "start_time": bounds[first],
+            "end_time": bounds[last],
+            "locations": {entity_id: present.get(entity_id) for entity_id in entity_ids},
+            "shared": {location: members for location, members in shared.items() if len(members) > 1},
+        })
+    return axis
+
+
+def stay_overlaps(stays):
+    """Every pair of stays of different entities at the same location that overlap in time, by start."""
+    flat = [(entity_id, stay) for entity_id, entity_stays in stays.items() for stay in entity_stays]
+    if len(flat) < 2:
+        return []
+    owner = np.array([i for i, entity_stays in enumerate(stays.values()) for _ in entity_stays])
+    location = np.array([stay["location"] for _, stay in flat], dtype=object)
+    starts = np.array([stay["start_time"].timestamp() for _, stay in flat])
+    ends = np.array([stay["end_time"].timestamp() for _, stay in flat])
+
+    # Pairwise over all stays; one stay per entity per moment keeps this small
+    left, right = np.triu_indices(len(flat), k=1)
+    lower = np.maximum(starts[left], starts[right])
+    upper = np.minimum(ends[left], ends[right])
+    hits = np.flatnonzero(
+        (owner[left] != owner[right]) & (location[left] == location[right]) & (lower <= upper)
+    )
+
+    overlaps = []
+    for k in hits[np.argsort(lower[hits], kind="stable")]:
+        (a, stay_a), (b, stay_b) = flat[left[k]], flat[right[k]]
+        start = max(stay_a["start_time"], stay_b["start_time"])
+        end = min(stay_a["end_time"], stay_b["end_time"])
+        overlaps.append({
+            "location": stay_a["location"],
+            "entity_ids": [a, b],
+            "start_time": start,
+            "end_time": end,
+            "minutes": round((end - start).total_seconds() / 60, 1),
+        })
+    return overlaps
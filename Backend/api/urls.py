@@ -10,8 +10,17 @@ urlpatterns = [
     path("entities/", views.EntitySearchAPIView.as_view(), name="entity-search"),
     path("entities/<str:entity_id>/", views.ProfileDetailAPIView.as_view(), name="entity-detail"),
     path("alerts/", views.AlertsListAPIView.as_view(), name="alerts-list"),
+    path("live/", views.live_updates, name="live-updates"),
     path("entities/<str:entity_id>/timeline/", views.TimelineDetailAPIView.as_view(), name="entity-timeline-detail"),
+    path("entities/<str:entity_id>/timeline/export/", views.TimelineExportAPIView.as_view(), name="entity-timeline-export"),
+    path("entities/<str:entity_id>/activity/", views.EntityActivityAPIView.as_view(), name="entity-activity"),
+    path("entities/<str:entity_id>/contacts/", views.ContactTraceAPIView.as_view(), name="entity-contacts"),
+    path("timelines/compare/", views.TimelineCompareAPIView.as_view(), name="timeline-compare"),
+    path("presence/query/", views.PresenceQueryAPIView.as_view(), name="presence-query"),
+    path("presence/attendance/", views.AttendanceAPIView.as_view(), name="presence-attendance"),
+    path("summaries/<uuid:summary_id>/", views.TimelineSummaryAPIView.as_view(), name="timeline-summary-detail"),
     path("search/face/", views.FaceSearchAPIView.as_view(), name="face-search"),
+    path("search/face/batch/", views.FaceBatchSearchAPIView.as_view(), name="face-search-batch"),
     path("predict/", views.PredictionAPIView.as_view(), name="predict-location"),
     path("forecast/", views.OccupancyAPIView.as_view(), name="forecast-count"),
     path("forecast-all/", views.OccupancyAllAPIView.as_view(), name="forecast-all-count"),
@@ -1,60 +1,59 @@
 import time
 import asyncio
+import json
 import pandas as pd
 import os
 from datetime import time as time_module
 from rest_framework import generics, status, viewsets
-from django.db.models import Q, Max, F, Window, OuterRef, Subquery
+from django.db.models import Q, F, Window, OuterRef, Subquery
+from django.db.models.functions import RowNumber
 from asgiref.sync import async_to_sync, sync_to_async
 from . import serializers
-from pgvector.django import CosineDistance
-from .summarizer import get_summary_for_entity
+from .summary_jobs import request_summary
+from .timeline import compare_timelines, fetch_timeline, timeline_key
 from .prediction import LocationPredictor
 from .explanation import get_prediction_explanation
+from django.conf import settings
 from django.utils import timezone
 from datetime import timedelta, datetime
 from rest_framework.views import APIView
 from rest_framework.response import Response
+from rest_framework.reverse import reverse
 from rest_framework import permissions
+from rest_framework.exceptions import AuthenticationFailed, ValidationError
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse, StreamingHttpResponse
 from . import models
+from .clock import parse_moment
+from .contacts import CONTACT_LIMIT, MAX_HOPS, trace_contacts
+from .face_index import get_face_index
+from .face_search import attach_profiles, batch_nearest_faces, ranked_profiles
+from .presence import daily_attendance
+from .slot_index import combine, slot_members
+from .alerts import alert_to_dict, decode_alert_cursor, encode_alert_cursor, location_capacities
 from .occupancy_predictor import OccupancyPredictor  # Original for single view
 from .all_occupancy_predictor import AllLocationsOccupancyPredictor  # New for bulk view
 from .occupancy_explainer import get_occupancy_explanation
-from .ActionRecommendation import GeminiAlertRecommender
-
-SIMULATION_NOW = timezone.make_aware(datetime(2025, 9, 25, 23, 59, 59))
-
-LOCATION_MAX_CAPACITY = {
-    'Admin Lobby': 710,
-    'Auditorium': 1360,
-    'Hostel': 5000,
-    'LAB_102': 15,
-    'LAB': 30,
-    'Library': 2150,
-    'Seminar Room': 1800,
-    'WORKSHOP': 20,
-    'LAB_305': 30,
-    'Gym': 1012,
-    'LAB_101': 40,
-    'Cafeteria': 1360,
-    'LAB_A2': 12,
-    'LAB_A1': 20,
-    'Main Building': 30,
-    'Faculty Office': 650
-}
-
-ACCESS_RULES = {
-    'Faculty Office': ['faculty', 'staff'],
-    'LAB_305': ['faculty', 'student'],
-    'Hostel': ['student'],
-    'Admin Lobby': ['faculty', 'staff'],
-    'Main Building': ['faculty', 'staff'],
-    'Library': ['faculty', 'staff', 'student']
-}
-
-
-def get_occupancy_status(location_name, predicted_count):
-    max_capacity = LOCATION_MAX_CAPACITY.get(location_name)
+from .ActionRecommendation import get_alert_recommender
+from .live_updates import MESSAGE_TYPES, broadcaster, format_event
+
+ALERTS_PER_TYPE = 10
+ALERTS_PAGE_SIZE = 50
+ALERTS_MAX_PAGE_SIZE = 500
+LIVE_HEARTBEAT_SECONDS = 15
+TIMELINE_EXPORT_BATCH_SIZE = 1000
+CONTACT_WINDOW_MINUTES = 15
+CONTACT_MAX_WINDOW_MINUTES = 24 * 60
+CONTACT_MAX_LIMIT = 500
+ACTIVITY_MAX_DAYS = 366
+
+
+def get_occupancy_status(location_name, predicted_count, capacities=None):
+    if capacities is None:
+        capacities = location_capacities()
+    max_capacity = capacities.get(location_name)
     if not max_capacity:
         return "Normal"
     ratio = predicted_count / max_capacity
@@ -93,186 +92,79 @@ class ProfileDetailAPIView(generics.RetrieveAPIView):
     lookup_field = "entity_id"
     queryset = models.Profile.objects.all()
 
-    def retrieve(self, request, *args, **kwargs):
-        inst = self.get_object()
-        data = self.get_serializer(inst).data
-        last_seen = models.Event.objects.filter(entity=inst).aggregate(last_seen=Max("timestamp"))["last_seen"]
-        data["last_seen"] = last_seen
-        return Response(data)
 
-
-class AlertsListAPIView(APIView):
+class EntityActivityAPIView(generics.ListAPIView):
     permission_classes = [permissions.IsAuthenticated]
+    serializer_class = serializers.EntityDailyActivitySerializer
 
-    def get(self, request):
-        all_alerts = []
-        hours_param = 10
-
-        gap_threshold = timedelta(hours=hours_param)
-        recent_window_start = SIMULATION_NOW - timedelta(days=4)
-        events = models.Event.objects.filter(
-            entity__isnull=False,
-            timestamp__lte=SIMULATION_NOW,
-            timestamp__gte=recent_window_start
-        ).select_related('entity').order_by('entity_id', 'timestamp').values(
-            'entity_id', 'entity__name', 'entity__email', 'timestamp'
-        )
-
-        entity_events = {}
-        for event in events:
-            entity_id = event['entity_id']
-            if entity_id not in entity_events:
-                entity_events[entity_id] = {
-                    'name': event['entity__name'],
-                    'email': event['entity__email'],
-                    'timestamps': []
-                }
-            entity_events[entity_id]['timestamps'].append(event['timestamp'])
-
-        # Missing Person alerts - limit to 10
-        missing_person_alerts = []
-        for entity_id, data in entity_events.items():
-            timestamps = data['timestamps']
-
-            for i in range(len(timestamps) - 1):
-                gap = timestamps[i + 1] - timestamps[i]
-                gap_start = timestamps[i]
-                gap_end = timestamps[i + 1]
-
-                actual_gap = gap
-
-                current = gap_start
-                sleeping_hours_to_subtract = timedelta(0)
-
-                while current < gap_end:
-                    next_day = current + timedelta(days=1)
-                    next_midnight = timezone.make_aware(
-                        datetime.combine(current.date() + timedelta(days=1), time_module.min))
-                    next_7am = timezone.make_aware(
-                        datetime.combine(current.date() + timedelta(days=1), time_module(7, 0)))
-
-                    if current < next_midnight < gap_end:
-                        sleep_start = next_midnight
-                        sleep_end = min(next_7am, gap_end)
-
-                        if sleep_end > sleep_start:
-                            sleeping_hours_to_subtract += (sleep_end - sleep_start)
-
-                    current = next_7am if next_7am < gap_end else gap_end
-
-                actual_gap -= sleeping_hours_to_subtract
-
-                if actual_gap >= gap_threshold:
-                    gap_hours = actual_gap.total_seconds() / 3600
-                    total_gap_hours = gap.total_seconds() / 3600
-                    missing_person_alerts.append({
-                        "alert_type": "Missing Person",
-                        "severity": 10,
-                        "message": f"{data['name']} had no activity for {gap_hours:.1f} hours (from {timestamps[i].strftime('%Y-%m-%d %H:%M')} to {timestamps[i + 1].strftime('%Y-%m-%d %H:%M')}, excluding sleeping hours).",
-                        "details": {
-                            "entity_id": str(entity_id),
-                            "name": data['name'],
-                            "gap_start": timestamps[i],
-                            "gap_end": timestamps[i + 1],
-                            "gap_hours": round(gap_hours, 1),
-                            "total_gap_hours": round(total_gap_hours, 1)
-                        },
-                        "recommendation": "Investigate unusual absence pattern."
-                    })
-
-        all_alerts.extend(missing_person_alerts[:10])
-
-        # Overcrowding alerts - limit to 10
-        overcrowding_alerts = []
-        for location_id, max_capacity in LOCATION_MAX_CAPACITY.items():
-            overcrowded = models.OccupancyData.objects.filter(
-                location_id=location_id,
-                count__gt=max_capacity
-            ).values('start_time', 'count').order_by('-count')[:10]
-
-            for entry in overcrowded:
-                overage_pct = ((entry['count'] - max_capacity) / max_capacity) * 100
-                overcrowding_alerts.append({
-                    "alert_type": "Overcrowding",
-                    "severity": min(8, 5 + int(overage_pct / 20)),
-                    "message": f"{location_id} was over capacity by {int(overage_pct)}% at {entry['start_time'].strftime('%Y-%m-%d %H:%M')}.",
-                    "details": {
-                        "location_name": location_id,
-                        "current_count": entry['count'],
-                        "max_capacity": max_capacity,
-                        "timestamp": entry['start_time']
-                    },
-                    "recommendation": "Monitor area and redirect traffic."
-                })
+    def get_queryset(self):
+        queryset = models.EntityDailyActivity.objects.filter(entity_id=self.kwargs["entity_id"])
+        try:
+            if self.request.query_params.get("from"):
+                queryset = queryset.filter(day__gte=datetime.strptime(self.request.query_params["from"], "%Y-%m-%d").date())
+            if self.request.query_params.get("to"):
+                queryset = queryset.filter(day__lte=datetime.strptime(self.request.query_params["to"], "%Y-%m-%d").date())
+        except ValueError:
+            raise ValidationError({"error": "Invalid date format. Please use YYYY-MM-DD."})
+        # Most recent days first, at most a year of rollups
+        return queryset.order_by("-day")[:ACTIVITY_MAX_DAYS]
 
-        all_alerts.extend(overcrowding_alerts[:10])
-
-        # Access Violation alerts - limit to 10
-        access_violation_alerts = []
-        for location, allowed_roles in ACCESS_RULES.items():
-            violations = models.Event.objects.filter(
-                location=location,
-                entity__role__isnull=False
-            ).exclude(
-                entity__role__in=allowed_roles
-            ).select_related('entity').values(
-                'entity__entity_id', 'entity__name', 'entity__role', 'timestamp', 'location'
-            )[:50]
-
-            for event in violations:
-                access_violation_alerts.append({
-                    "alert_type": "Access Violation",
-                    "severity": 7,
-                    "message": f"{event['entity__name']} ({event['entity__role']}) entered restricted area: {location}.",
-                    "details": {
-                        "entity_id": str(event['entity__entity_id']),
-                        "name": event['entity__name'],
-                        "role": event['entity__role'],
-                        "location": location,
-                        "timestamp": event['timestamp']
-                    },
-                    "recommendation": "Verify entity credentials. Dispatch security if necessary."
-                })
 
-        all_alerts.extend(access_violation_alerts[:10])
+class AlertsListAPIView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
 
-        # After Hours Access alerts - limit to 10
-        after_hours_alerts = []
-        after_hours_locations = ['Main Building', 'Library']
-        after_hours_roles = ['staff', 'student']
+    def get(self, request):
+        alerts_qs = models.Alert.objects.all()
 
-        after_hours_events = models.Event.objects.filter(
-            location__in=after_hours_locations,
-            entity__role__in=after_hours_roles
-        ).select_related('entity').values(
-            'entity__entity_id', 'entity__name', 'entity__role', 'timestamp', 'location'
-        )
+        try:
+            for param, lookup in (("since", "occurred_at__gte"), ("until", "occurred_at__lte")):
+                value = request.query_params.get(param)
+                if value:
+                    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+                    if timezone.is_naive(parsed):
+                        parsed = timezone.make_aware(parsed)
+                    alerts_qs = alerts_qs.filter(**{lookup: parsed})
+        except ValueError:
+            return Response({"error": "Invalid since/until format. Use ISO string."},
+                            status=status.HTTP_400_BAD_REQUEST)
 
-        for event in after_hours_events:
-            event_hour = event['timestamp'].hour
-            if event_hour >= 22 or event_hour < 7:
-                after_hours_alerts.append({
-                    "alert_type": "After Hours Access",
-                    "severity": 6,
-                    "message": f"{event['entity__name']} ({event['entity__role']}) accessed {event['location']} during restricted hours at {event['timestamp'].strftime('%Y-%m-%d %H:%M')}.",
-                    "details": {
-                        "entity_id": str(event['entity__entity_id']),
-                        "name": event['entity__name'],
-                        "role": event['entity__role'],
-                        "location": event['location'],
-                        "timestamp": event['timestamp']
-                    },
-                    "recommendation": "Verify authorization for after-hours access."
-                })
+        types = request.query_params.get("types")
+        if types:
+            allowed = [t.strip() for t in types.split(",") if t.strip()]
+            known = {choice[0] for choice in models.ALERT_TYPE_CHOICES}
+            unknown = set(allowed) - known
+            if unknown:
+                return Response({"error": f"Unknown alert types: {', '.join(sorted(unknown))}"},
+                                status=status.HTTP_400_BAD_REQUEST)
+            alerts_qs = alerts_qs.filter(alert_type__in=allowed)
+
+        min_severity = request.query_params.get("min_severity")
+        if min_severity:
+            try:
+                alerts_qs = alerts_qs.filter(severity__gte=int(min_severity))
+            except ValueError:
+                return Response({"error": "min_severity must be an integer."}, status=status.HTTP_400_BAD_REQUEST)
+
+        if "cursor" in request.query_params or "limit" in request.query_params:
+            return self.get_page(request, alerts_qs)
+
+        # Latest ALERTS_PER_TYPE alerts of each type in a single query
+        alerts_qs = alerts_qs.annotate(
+            type_rank=Window(
+                RowNumber(),
+                partition_by=[F('alert_type')],
+                order_by=[F('occurred_at').desc(), F('id').desc()]
+            )
+        ).filter(type_rank__lte=ALERTS_PER_TYPE)
 
-        all_alerts.extend(after_hours_alerts[:10])
+        all_alerts = [alert_to_dict(alert) for alert in alerts_qs]
 
         all_alerts.sort(key=lambda x: x['severity'], reverse=True)
         alerts_data = {"alerts": all_alerts, "count": len(all_alerts)}
 
         try:
             if os.environ.get("GEMINI_API_KEY"):
-                recommender = GeminiAlertRecommender(model="gemini-2.0-flash")
+                recommender = get_alert_recommender(model="gemini-2.0-flash")
 
                 alerts_data = recommender.generate_recommendations(alerts_data)
             else:
@@ -283,13 +175,260 @@ class AlertsListAPIView(APIView):
 
         return Response(alerts_data)
 
+    def get_page(self, request, alerts_qs):
+        """Keyset page over (occurred_at, id), newest first. Stored recommendations are returned as-is."""
+        try:
+            limit = min(int(request.query_params.get("limit", ALERTS_PAGE_SIZE)), ALERTS_MAX_PAGE_SIZE)
+            if limit < 1:
+                raise ValueError
+        except ValueError:
+            return Response({"error": f"limit must be between 1 and {ALERTS_MAX_PAGE_SIZE}."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        cursor = request.query_params.get("cursor")
+        if cursor:
+            try:
+                occurred_at, alert_id = decode_alert_cursor(cursor)
+            except ValueError:
+                return Response({"error": "Invalid cursor."}, status=status.HTTP_400_BAD_REQUEST)
+            # The plain bound lets the index scan start at the cursor; the OR alone would not
+            alerts_qs = alerts_qs.filter(
+                Q(occurred_at__lt=occurred_at) | Q(occurred_at=occurred_at, id__lt=alert_id),
+                occurred_at__lte=occurred_at
+            )
+
+        page = list(alerts_qs.order_by('-occurred_at', '-id')[:limit + 1])
+        next_cursor = encode_alert_cursor(page[limit - 1]) if len(page) > limit else None
+        alerts = [alert_to_dict(alert) for alert in page[:limit]]
+
+        return Response({"alerts": alerts, "count": len(alerts), "next_cursor": next_cursor})
+
+
+async def authenticate_stream(request):
+    """
+    JWT check for the async live-updates stream, which bypasses DRF. Returns an error
+    response, or None if the request is authenticated.
+
+    EventSource cannot send headers, so the access token may also be passed as `?token=`.
+    """
+    auth = JWTAuthentication()
+    header = auth.get_header(request)
+    raw_token = auth.get_raw_token(header) if header else request.GET.get("token")
+    try:
+        if not raw_token:
+            raise AuthenticationFailed("Authentication credentials were not provided.")
+        validated_token = await sync_to_async(auth.get_validated_token)(raw_token)
+        await sync_to_async(auth.get_user)(validated_token)
+    except (InvalidToken, AuthenticationFailed) as e:
+        return JsonResponse({"detail": str(e)}, status=status.HTTP_401_UNAUTHORIZED)
+    return None
+
+
+async def live_updates(request):
+    """
+    Server-Sent Events stream of new alerts, live activity and occupancy changes.
+
+    `?types=alerts,occupancy` limits the stream to some message types.
+    """
+    error = await authenticate_stream(request)
+    if error:
+        return error
+
+    types = request.GET.get("types")
+    wanted = {t.strip() for t in types.split(",") if t.strip()} if types else MESSAGE_TYPES
+    if not wanted <= MESSAGE_TYPES:
+        return JsonResponse({"error": f"Unknown types: {', '.join(sorted(wanted - MESSAGE_TYPES))}"},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+    queue = broadcaster.subscribe()
+
+    async def stream():
+        try:
+            yield "retry: 5000\n\n"
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), timeout=LIVE_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if message["type"] in wanted:
+                    yield format_event(message)
+        finally:
+            broadcaster.unsubscribe(queue)
+
+    response = StreamingHttpResponse(stream(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+class QueryTokenJWTAuthentication(JWTAuthentication):
+    """JWT from the Authorization header, or from `?token=` for download links that cannot send headers."""
+
+    def authenticate(self, request):
+        header = self.get_header(request)
+        raw_token = self.get_raw_token(header) if header else request.query_params.get("token")
+        if not raw_token:
+            return None
+        validated_token = self.get_validated_token(raw_token)
+        return self.get_user(validated_token), validated_token
+
+
+class TimelineExportAPIView(APIView):
+    """
+    Streams an entity's events between `from` and `to` as newline-delimited JSON.
+
+    Events are read in keyset batches on (timestamp, event_id), so memory stays flat and the
+    first lines go out before the whole range has been read. Each line has the timeline
+    layout with `entity` reduced to the entity id. The view is synchronous on purpose: under
+    WSGI, Django would drain an async iterator before sending anything.
+    """
+    authentication_classes = [QueryTokenJWTAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, entity_id):
+        if not models.Profile.objects.filter(entity_id=entity_id).exists():
+            return Response({"detail": "Profile not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        try:
+            start_time = parse_moment(request.query_params["from"])
+            end_time = parse_moment(request.query_params["to"])
+        except KeyError:
+            return Response({"error": "'from' and 'to' query parameters (ISO 8601) are required."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        except ValueError:
+            return Response({"error": "Invalid 'from' or 'to'. Use ISO 8601 format."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if end_time < start_time:
+            return Response({"error": "'to' must not be before 'from'."}, status=status.HTTP_400_BAD_REQUEST)
+
+        types = request.query_params.get("types")
+        allowed = [t.strip() for t in types.split(",") if t.strip()] if types else []
+
+        def stream():
+            after = None
+            while True:
+                batch = fetch_timeline(
+                    entity_id, start_time, end_time, types=allowed, entity=entity_id,
+                    after=after, limit=TIMELINE_EXPORT_BATCH_SIZE
+                )
+                if not batch:
+                    break
+                yield "".join(json.dumps(event, cls=DjangoJSONEncoder) + "\n" for event in batch)
+                if len(batch) < TIMELINE_EXPORT_BATCH_SIZE:
+                    break
+                after = timeline_key(batch[-1])
+
+        response = StreamingHttpResponse(stream(), content_type="application/x-ndjson")
+        response["Content-Disposition"] = f'attachment; filename="timeline-{entity_id}.ndjson"'
+        response["X-Accel-Buffering"] = "no"
+        return response
+
+
+class ContactTraceAPIView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, entity_id):
+        if not models.Profile.objects.filter(entity_id=entity_id).exists():
+            return Response({"detail": "Profile not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        try:
+            start_time = parse_moment(request.query_params["from"])
+            end_time = parse_moment(request.query_params["to"])
+        except KeyError:
+            return Response({"error": "'from' and 'to' query parameters (ISO 8601) are required."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        except ValueError:
+            return Response({"error": "Invalid 'from' or 'to'. Use ISO 8601 format."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if end_time < start_time:
+            return Response({"error": "'to' must not be before 'from'."}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            window_minutes = int(request.query_params.get("window", CONTACT_WINDOW_MINUTES))
+            hops = int(request.query_params.get("hops", 1))
+            limit = int(request.query_params.get("limit", CONTACT_LIMIT))
+        except ValueError:
+            return Response({"error": "window, hops and limit must be integers."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if not 0 <= window_minutes <= CONTACT_MAX_WINDOW_MINUTES:
+            return Response({"error": f"window must be between 0 and {CONTACT_MAX_WINDOW_MINUTES} minutes."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if not 1 <= hops <= MAX_HOPS:
+            return Response({"error": f"hops must be between 1 and {MAX_HOPS}."}, status=status.HTTP_400_BAD_REQUEST)
+        limit = max(1, min(limit, CONTACT_MAX_LIMIT))
+
+        contacts = trace_contacts(
+            entity_id, start_time, end_time, timedelta(minutes=window_minutes), hops=hops, limit=limit
+        )
+        return Response({
+            "entity_id": entity_id,
+            "from": start_time,
+            "to": end_time,
+            "window_minutes": window_minutes,
+            "hops": hops,
+            "contacts": contacts,
+        })
+
+
+class PresenceQueryAPIView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        serializer = serializers.PresenceQuerySerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        query = serializer.validated_data
+
+        sets = [slot_members(term["location"], term["start"], term["end"]) for term in query["terms"]]
+        members = combine(sets, query["op"])
+
+        result = {
+            "op": query["op"],
+            "count": len(members),
+            "terms": [
+                {"location": term["location"], "start": term["start"], "end": term["end"], "count": len(term_members)}
+                for term, term_members in zip(query["terms"], sets)
+            ],
+        }
+        if not query["count_only"]:
+            profiles = models.Profile.objects.filter(ordinal__ordinal__in=members.tolist()).order_by("name")
+            result["entities"] = [
+                {"entity_id": profile.entity_id, "name": profile.name, "role": profile.role}
+                for profile in profiles
+            ]
+        return Response(result)
+
+
+class AttendanceAPIView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        serializer = serializers.AttendanceQuerySerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        query = serializer.validated_data
+
+        # Answered from the daily presence bitmaps; raw events are never scanned
+        rows = daily_attendance(query["date"], query["slots"], query.get("entity_ids"))
+        profiles = models.Profile.objects.in_bulk([row["entity_id"] for row in rows])
+        for row in rows:
+            profile = profiles.get(row["entity_id"])
+            row["name"] = profile.name if profile else None
+            row["role"] = profile.role if profile else None
+
+        return Response({
+            "date": query["date"],
+            "slots": query["slots"],
+            "present_in_all": sum(row["present_in_all"] for row in rows),
+            "entities": rows,
+        })
+
 
 class TimelineDetailAPIView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
-    @async_to_sync
-    async def get(self, request, entity_id):
-        if not await sync_to_async(models.Profile.objects.filter(entity_id=entity_id).exists)():
+    def get(self, request, entity_id):
+        profile = models.Profile.objects.filter(entity_id=entity_id).first()
+        if profile is None:
             return Response({"detail": "Profile not found"}, status=status.HTTP_404_NOT_FOUND)
 
         date_str = request.query_params.get('date')
@@ -305,67 +444,146 @@ class TimelineDetailAPIView(APIView):
             end_time = timezone.make_aware(datetime.combine(target_date, time_module.max))
         except ValueError:
             return Response({"error": "Invalid date format. Please use YYYY-MM-DD."},
-                            status=status.HTTP_44_BAD_REQUEST)
+                            status=status.HTTP_400_BAD_REQUEST)
 
-        summary_task = get_summary_for_entity(entity_id, start_time, end_time)
+        allowed = [t.strip() for t in types.split(",") if t.strip()] if types else []
+        # Serialized once and shared by every event of the response
+        profile_data = serializers.ProfileSerializer(profile).data
 
-        async def get_timeline_data():
-            @sync_to_async
-            def fetch_and_serialize():
-                ev_qs = models.Event.objects.filter(
-                    entity__entity_id=entity_id,
-                    timestamp__gte=start_time,
-                    timestamp__lte=end_time
-                )
-                if types:
-                    allowed = [t.strip() for t in types.split(",") if t.strip()]
-                    if allowed:
-                        ev_qs = ev_qs.filter(event_type__in=allowed)
+        # The LLM summary is produced in the background and polled through its own endpoint
+        summary = request_summary(entity_id, start_time, end_time)
+        timeline_result = fetch_timeline(entity_id, start_time, end_time, types=allowed, entity=profile_data)
 
-                ev_qs = ev_qs.prefetch_related(
-                    'entity', 'wifi_logs', 'card_swipes', 'cctv_frames',
-                    'notes', 'lab_bookings', 'library_checkout',
-                ).order_by("timestamp")
+        return Response({
+            "summary": summary.summary if summary.status == "ready" else None,
+            "summary_id": summary.id,
+            "summary_status": summary.status,
+            "summary_url": reverse("timeline-summary-detail", args=[summary.id], request=request),
+            "timeline": timeline_result
+        })
 
-                serializer = serializers.TimelineEventSerializer(ev_qs, many=True)
-                return serializer.data
 
-            return await fetch_and_serialize()
+class TimelineCompareAPIView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
 
-        summary_result, timeline_result = await asyncio.gather(
-            summary_task,
-            get_timeline_data()
-        )
+    def post(self, request):
+        serializer = serializers.TimelineCompareSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        query = serializer.validated_data
+
+        entity_ids = query["entity_ids"]
+        profiles = models.Profile.objects.in_bulk(entity_ids)
+        missing = [entity_id for entity_id in entity_ids if entity_id not in profiles]
+        if missing:
+            return Response({"detail": "Profile not found", "missing": missing}, status=status.HTTP_404_NOT_FOUND)
+
+        start_time = timezone.make_aware(datetime.combine(query["date"], time_module.min))
+        end_time = timezone.make_aware(datetime.combine(query["date"], time_module.max))
+        comparison = compare_timelines(entity_ids, start_time, end_time)
+
+        entities = []
+        for entity_id in entity_ids:
+            entity = {
+                "entity": serializers.ProfileSerializer(profiles[entity_id]).data,
+                "stays": comparison["stays"][entity_id],
+            }
+            # LLM summaries are opt-in here; they are queued like on the single timeline
+            if query["summaries"]:
+                summary = request_summary(entity_id, start_time, end_time)
+                entity.update({
+                    "summary": summary.summary if summary.status == "ready" else None,
+                    "summary_id": summary.id,
+                    "summary_status": summary.status,
+                    "summary_url": reverse("timeline-summary-detail", args=[summary.id], request=request),
+                })
+            entities.append(entity)
 
         return Response({
-            "summary": summary_result,
-            "timeline": timeline_result
+            "date": query["date"],
+            "entities": entities,
+            "axis": comparison["axis"],
+            "overlaps": comparison["overlaps"],
         })
 
 
+class TimelineSummaryAPIView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, summary_id):
+        summary = models.TimelineSummary.objects.filter(pk=summary_id).first()
+        if summary is None:
+            return Response({"detail": "Summary not found"}, status=status.HTTP_404_NOT_FOUND)
+        return Response(serializers.TimelineSummarySerializer(summary).data)
+
+
 class FaceSearchAPIView(APIView):
     permission_classes = [permissions.AllowAny]
 
     def post(self, request):
         serializer = serializers.FaceSearchRequestSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        embedding = serializer.validated_data["embedding"]
+        query = serializer.validated_data
+
+        # The in-process index answers unfiltered searches; it returns None until loaded or when stale
+        face_index = get_face_index()
+        candidates = None
+        if face_index and not query.get("roles") and not query.get("departments"):
+            candidates = face_index.search(query["embedding"], k=query.get("k", 1), threshold=settings.FACE_MATCH_THRESHOLD)
+        if candidates is None:
+            # Threshold, filters and one-embedding-per-profile are all applied in SQL
+            candidates = ranked_profiles(
+                query["embedding"],
+                k=query.get("k", 1),
+                roles=query.get("roles"),
+                departments=query.get("departments"),
+                ef_search=query.get("ef_search"),
+                probes=query.get("probes")
+            )
+        candidates = attach_profiles([candidates], lambda profile: serializers.ProfileSerializer(profile).data)[0]
 
-        closest_face = models.FaceEmbedding.objects.annotate(
-            distance=CosineDistance('embedding', embedding)
-        ).order_by('distance').first()
+        if "k" in query:
+            return Response({
+                "match": bool(candidates),
+                "threshold": settings.FACE_MATCH_THRESHOLD,
+                "margin": candidates[0]["margin"] if candidates else None,
+                "candidates": [{"rank": rank, **candidate} for rank, candidate in enumerate(candidates, start=1)],
+            })
 
-        if closest_face and closest_face.distance < 0.4:
-            profile_data = serializers.ProfileSerializer(closest_face.profile).data
+        if candidates:
             return Response({
                 "match": True,
-                "profile": profile_data,
-                "distance": closest_face.distance
+                "profile": candidates[0]["profile"],
+                "distance": candidates[0]["distance"]
             })
 
         return Response({"match": False, "detail": "No confident match found."}, status=status.HTTP_404_NOT_FOUND)
 
 
+class FaceBatchSearchAPIView(APIView):
+    permission_classes = [permissions.AllowAny]
+
+    def post(self, request):
+        serializer = serializers.FaceBatchSearchRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        query = serializer.validated_data
+
+        # One statement for all probes, then one query for every matched profile
+        results = attach_profiles(
+            batch_nearest_faces(query["embeddings"], limit=query["k"], ef_search=query.get("ef_search"), probes=query.get("probes")),
+            lambda profile: serializers.ProfileSerializer(profile).data
+        )
+        return Response({
+            "results": [
+                {
+                    "index": i,
+                    "match": bool(matches) and matches[0]["distance"] < settings.FACE_MATCH_THRESHOLD,
+                    "matches": matches,
+                }
+                for i, matches in enumerate(results)
+            ]
+        })
+
+
 class PredictionAPIView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
@@ -489,8 +707,9 @@ class OccupancyAllAPIView(APIView):
 
             df_all = pd.DataFrame(list(all_data_qs))
 
-            # 3. Get all locations from the capacity dictionary
-            all_locations = LOCATION_MAX_CAPACITY.keys()
+            # 3. Get all locations from the capacities table
+            capacities = location_capacities()
+            all_locations = capacities.keys()
             results = []
 
             # 4. Initialize the NEW predictor with all data
@@ -505,7 +724,7 @@ class OccupancyAllAPIView(APIView):
                 )
 
                 # 7. Get its status
-                status_label = get_occupancy_status(location_id, predicted_occupancy)
+                status_label = get_occupancy_status(location_id, predicted_occupancy, capacities)
 
                 # 8. Append the result
                 results.append({
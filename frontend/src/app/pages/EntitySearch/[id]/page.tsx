@@ -170,6 +170,23 @@ export default function EntityPage() {
     };
 
    useEffect(() => {
+  let cancelled = false;
+
+  // The AI summary is generated in the background; poll its status until it is ready
+  const pollSummary = async (url: string, headers: HeadersInit) => {
+    for (let attempt = 0; attempt < 30 && !cancelled; attempt++) {
+      await new Promise((resolve) => setTimeout(resolve, 2000));
+      const res = await fetch(url, { headers });
+      if (!res.ok || cancelled) return;
+      const job = await res.json();
+      if (job.status === "ready") {
+        setSummary(job.summary || "");
+        return;
+      }
+      if (job.status === "failed") return;
+    }
+  };
+
   const fetchAll = async () => {
     if (!entityId || !selectedDate) return;
 
@@ -204,6 +221,9 @@ export default function EntityPage() {
         const data = await tRes.json();
         setTimeline(data.timeline || []);
         setSummary(data.summary || "");
+        if (data.summary_status === "pending" && data.summary_url) {
+          pollSummary(data.summary_url, authHeaders);
+        }
       } else {
         setTimeline([]);
         setSummary("");
@@ -239,6 +259,9 @@ export default function EntityPage() {
   };
 
   fetchAll();
+  return () => {
+    cancelled = true;
+  };
 }, [entityId, selectedDate]);
 
 